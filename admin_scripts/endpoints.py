@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Hydrometric endpoint URL templates shared by the station probe scripts.
+
+Each template takes the station number as ``{sid}``.
+"""
+
+# Legacy wateroffice inline CSV service
+REALTIME_CSV_TEMPLATES = (
+    # Original format that was working before
+    'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={sid}&parameters[]=47',
+
+    # Alternative parameter formats
+    'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations={sid}&parameters=47',
+    'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={sid}',
+    'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={sid}&parameters[]=46', # water level
+)
+
+# Government of Canada JSON API (latest reading only)
+WEATHER_GC_CA_TEMPLATE = 'https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={sid}&limit=1&f=json'
+
+# MSC Datamart CSV files
+MSC_DATAMART_TEMPLATES = (
+    'https://dd.weather.gc.ca/today/hydrometric/csv/{sid}_hourly.csv',
+    'https://dd.weather.gc.ca/today/hydrometric/csv/{sid}.csv',
+)
+
+ALL_TEMPLATES = REALTIME_CSV_TEMPLATES + (WEATHER_GC_CA_TEMPLATE,) + MSC_DATAMART_TEMPLATES
+
+def expand(templates, station_id):
+    """Fill each template with the station number, preserving order"""
+    return [template.format(sid=station_id) for template in templates]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Small client for the api.weather.gc.ca hydrometric collections.
+
+Fetches OGC API items through the shared probe session and decodes them with
+orjson when it is installed, so scripts get features back in one call.
+"""
+
+import endpoints
+import http_cache
+from probe_common import SESSION, fast_json, pick_reading
+
+API_ROOT = 'https://api.weather.gc.ca'
+
+# The collection list is effectively static; reuse a cached copy for a day without asking
+COLLECTIONS_MAX_AGE = 24 * 3600
+
+def get_features(url, timeout=15, params=None):
+    """GET an OGC API items URL, returning (status code, list of features)"""
+    response = SESSION.get(url, params=params, timeout=timeout)
+    if response.status_code != 200:
+        return response.status_code, []
+    return response.status_code, fast_json.loads(response.content).get('features') or []
+
+def get_items(collection_id, timeout=15, **params):
+    """Query a collection's items, returning (status code, list of features)"""
+    return get_features(f'{API_ROOT}/collections/{collection_id}/items', timeout, {**params, 'f': 'json'})
+
+def get_station_realtime(station_id, timeout=15):
+    """Return (status code, latest (name, discharge, level, time) reading or None) from hydrometric-realtime"""
+    status, features = get_features(endpoints.WEATHER_GC_CA_TEMPLATE.format(sid=station_id), timeout)
+    return status, pick_reading(features) if features else None
+
+def get_station_monthly(station_id, start=None, limit=50, timeout=15):
+    """Return (status code, monthly-mean features newest first) for a station, optionally from a start date"""
+    params = {
+        'STATION_NUMBER': station_id,
+        'limit': limit,
+        'sortby': '-DATE',
+        'properties': 'DATE,MONTHLY_MEAN_DISCHARGE,MONTHLY_MEAN_LEVEL',
+        'skipGeometry': 'true',
+    }
+    if start:
+        params['datetime'] = f'{start}/..'
+    return get_items('hydrometric-monthly-mean', timeout, **params)
+
+def get_collections(timeout=15):
+    """Return (status code, list of collection descriptions), served from the HTTP cache when fresh"""
+    status, body = http_cache.conditional_get(
+        SESSION, f'{API_ROOT}/collections?f=json', max_age=COLLECTIONS_MAX_AGE, timeout=timeout,
+    )
+    if status != 200:
+        return status, []
+    return status, fast_json.loads(body).get('collections') or []
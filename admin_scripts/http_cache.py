@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+On-disk conditional-GET cache for documents that rarely change.
+
+Each body is stored with its ETag/Last-Modified and revalidated with
+If-None-Match/If-Modified-Since, so an unchanged document costs a 304
+instead of a full download. Callers may also pass max_age to reuse a copy
+younger than that many seconds without asking the server at all.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+
+CACHE_DIR = Path.home() / '.cache' / 'brownclaw' / 'http'
+
+def _paths(url):
+    key = hashlib.sha1(url.encode()).hexdigest()
+    return CACHE_DIR / f'{key}.json', CACHE_DIR / f'{key}.body'
+
+def conditional_get(session, url, max_age=None, **kwargs):
+    """GET url, revalidating any cached copy; returns (status_code, body bytes) with a 304 reported as 200.
+    Cached copies younger than max_age seconds are returned without a request."""
+    meta_path, body_path = _paths(url)
+    headers = dict(kwargs.pop('headers', None) or {})
+
+    try:
+        meta = json.loads(meta_path.read_text())
+        cached_body = body_path.read_bytes()
+    except (OSError, ValueError):
+        meta, cached_body = {}, None
+
+    if cached_body is not None and max_age and time.time() - meta.get('saved_at', 0) < max_age:
+        return 200, cached_body
+
+    if cached_body is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = session.get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and cached_body is not None:
+        meta_path.write_text(json.dumps({**meta, 'saved_at': time.time()}))
+        return 200, cached_body
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if response.status_code == 200 and (etag or last_modified or max_age):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        body_path.write_bytes(response.content)
+        meta_path.write_text(json.dumps({
+            'url': url, 'etag': etag, 'last_modified': last_modified, 'saved_at': time.time(),
+        }))
+
+    return response.status_code, response.content
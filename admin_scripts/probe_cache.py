@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Small on-disk TTL cache of which API URL last worked for a station.
+
+The probe scripts try several URL formats per station; the winning one rarely
+changes between runs, so they try the cached URL first and only fall back to
+the full list when it stops working.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+CACHE_FILE = Path.home() / '.cache' / 'brownclaw' / 'probe_cache.json'
+TTL_SECONDS = 3600
+
+_lock = threading.Lock()
+
+def _load():
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save(entries):
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_FILE, 'w') as f:
+        json.dump(entries, f, indent=2)
+
+def get_winner(script, station_id):
+    """Return the cached working URL for (script, station_id), or None if missing/expired"""
+    with _lock:
+        entry = _load().get(f'{script}:{station_id}')
+    if entry and time.time() - entry['saved_at'] < TTL_SECONDS:
+        return entry['url']
+    return None
+
+def set_winner(script, station_id, url):
+    """Remember the URL that returned usable data for (script, station_id)"""
+    with _lock:
+        entries = _load()
+        entries[f'{script}:{station_id}'] = {'url': url, 'saved_at': time.time()}
+        _save(entries)
+
+def forget(script, station_id):
+    """Drop the cached URL for (script, station_id) after it stops working"""
+    with _lock:
+        entries = _load()
+        if entries.pop(f'{script}:{station_id}', None) is not None:
+            _save(entries)
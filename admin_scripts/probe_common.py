@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+HTTP session and response parsers shared by the station probe scripts.
+
+The probe and station test scripts import these instead of each building
+their own session and parsers, so a process running several probes reuses
+one connection pool.
+"""
+
+import csv
+import json
+import os
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Decode response bytes with orjson when it is installed
+try:
+    import orjson as fast_json
+except ImportError:
+    fast_json = json
+
+# Shared keep-alive session; retries transient gateway errors
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, connect=1, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+))
+SESSION.headers.update({'User-Agent': 'BrownClaw-Water-App/1.0'})
+
+# Extra diagnostic output (CSV headers, error bodies); enable with DEBUG=1
+VERBOSE = os.environ.get('DEBUG') == '1'
+
+# (connect, read) timeouts per host; a short connect timeout fails dead endpoints fast
+TIMEOUTS = {
+    'wateroffice.ec.gc.ca': (3, 10),
+    'api.weather.gc.ca': (3, 10),
+    'dd.weather.gc.ca': (2, 5),
+}
+DEFAULT_TIMEOUT = (3, 10)
+
+def timeout_for(url):
+    """Return the (connect, read) timeout for a URL's host"""
+    return TIMEOUTS.get(urlparse(url).hostname, DEFAULT_TIMEOUT)
+
+def body_snippet(response, limit=200):
+    """Decode at most the first limit bytes of a streamed response body"""
+    return next(response.iter_content(chunk_size=limit), b'').decode('utf-8', errors='replace')
+
+def pick_reading(features):
+    """Flatten JSON features to (name, discharge, level, time) and pick the first with discharge, else level"""
+    readings = [
+        (p.get('STATION_NAME', 'Unknown'), p.get('DISCHARGE'), p.get('LEVEL'), p.get('DATETIME_LST', p.get('DATETIME')))
+        for p in (feature.get('properties', {}) for feature in features)
+    ]
+    return (next((r for r in readings if r[1] is not None), None)
+            or next((r for r in readings if r[2] is not None), None)
+            or readings[0])
+
+def parse_flow_row(row):
+    """Return the discharge value from a parsed CSV row, or None if it has none"""
+    if len(row) >= 3 and not row[0].startswith('#'):
+        flow_str = row[2].strip()
+        if flow_str and flow_str.lower() not in ['no data', 'nan']:
+            try:
+                return float(flow_str)
+            except ValueError:
+                pass
+    return None
+
+def latest_flow_rate(lines):
+    """Return the newest discharge from the given data lines, starting at the last one"""
+    for row in csv.reader(reversed(lines), skipinitialspace=True):
+        flow_rate = parse_flow_row(row)
+        if flow_rate is not None:
+            return flow_rate
+    return None
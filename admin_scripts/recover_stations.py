@@ -7,19 +7,30 @@ import requests
 import firebase_admin
 from firebase_admin import credentials, firestore
 import logging
+import json
+import os
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Firestore caps a write batch at 500 operations and 10 MiB; stay just under the payload cap
+MAX_BATCH_OPS = 500
+MAX_BATCH_BYTES = 9 * 1024 * 1024
+
 def recover_stations_collection():
     """Recreate the water_stations collection with official Environment Canada data."""
     
     # Initialize Firebase
     logger.info("Initializing Firebase...")
     try:
-        cred = credentials.Certificate('service_account_key.json')
+        # Prefer already-parsed credentials from the environment (cron jobs)
+        cred_json = os.getenv('FIREBASE_CREDENTIALS_JSON')
+        if cred_json:
+            cred = credentials.Certificate(json.loads(cred_json))
+        else:
+            cred = credentials.Certificate('service_account_key.json')
         try:
             app = firebase_admin.get_app()
         except ValueError:
@@ -59,9 +70,12 @@ def recover_stations_collection():
     
     created_count = 0
     error_count = 0
-    batch_size = 100
     batch = db.batch()
     batch_count = 0
+    batch_bytes = 0
+    
+    # All documents share the recovery run time
+    now_iso = datetime.now().isoformat()
     
     for line_num, line in enumerate(lines[1:], 2):
         try:
@@ -113,8 +127,8 @@ def recover_stations_collection():
                         'name_source': 'Environment Canada Official',
                         'api_available': True,
                         'is_whitewater': False,  # Will be updated later for whitewater rivers
-                        'created_at': datetime.now().isoformat(),
-                        'updated_at': datetime.now().isoformat(),
+                        'created_at': now_iso,
+                        'updated_at': now_iso,
                         'status': 'Active'
                     }
                     
@@ -122,6 +136,7 @@ def recover_stations_collection():
                     doc_ref = stations_ref.document(station_id)
                     batch.set(doc_ref, station_doc)
                     batch_count += 1
+                    batch_bytes += len(json.dumps(station_doc))
                     created_count += 1
                     
                     if created_count <= 10:  # Log first 10 for verification
@@ -129,38 +144,35 @@ def recover_stations_collection():
                     elif created_count % 100 == 0:
                         logger.info(f"📊 Created {created_count} stations so far...")
                     
-                    # Commit batch when full
-                    if batch_count >= batch_size:
+                    # Commit batch when it hits either the op or payload limit
+                    if batch_count >= MAX_BATCH_OPS or batch_bytes >= MAX_BATCH_BYTES:
                         batch.commit()
                         logger.info(f"💾 Committed batch of {batch_count} stations")
                         batch = db.batch()
                         batch_count = 0
+                        batch_bytes = 0
                         
         except Exception as e:
             logger.error(f"❌ Error processing line {line_num}: {e}")
             error_count += 1
             continue
     
-    # Commit final batch
-    if batch_count > 0:
-        batch.commit()
-        logger.info(f"💾 Committed final batch of {batch_count} stations")
+    metadata_doc = {
+        'recovery_date': now_iso,
+        'stations_created': created_count,
+        'errors': error_count,
+        'source': 'Environment Canada Official Station List',
+        'csv_url': 'https://dd.weather.gc.ca/hydrometric/doc/hydrometric_StationList.csv',
+        'total_official_stations': len(lines) - 1
+    }
+    metadata_ref = db.collection('metadata').document('stations_recovery')
     
-    # Create metadata document
-    try:
-        metadata_ref = db.collection('metadata').document('stations_recovery')
-        metadata_doc = {
-            'recovery_date': datetime.now().isoformat(),
-            'stations_created': created_count,
-            'errors': error_count,
-            'source': 'Environment Canada Official Station List',
-            'csv_url': 'https://dd.weather.gc.ca/hydrometric/doc/hydrometric_StationList.csv',
-            'total_official_stations': len(lines) - 1
-        }
-        db.collection('metadata').document('stations_recovery').set(metadata_doc)
-        logger.info("📋 Created recovery metadata document")
-    except Exception as e:
-        logger.error(f"❌ Failed to create metadata: {e}")
+    # The metadata rides in the final batch, so it is written in the same round-trip
+    # and only if the last stations commit with it (the loop leaves room for one op)
+    batch.set(metadata_ref, metadata_doc)
+    batch.commit()
+    logger.info(f"💾 Committed final batch of {batch_count} stations")
+    logger.info("📋 Created recovery metadata document")
     
     # Summary
     logger.info("="*60)
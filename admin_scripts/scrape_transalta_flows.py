@@ -10,7 +10,7 @@ Website: https://transalta.com/river-flows/
 """
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime
 import json
 import re
@@ -22,6 +22,31 @@ HEADERS = {
     'Accept-Language': 'en-US,en;q=0.9',
 }
 
+# Precompiled patterns used inside the per-cell / per-script loops
+_NUM_RE = re.compile(r'\d+\.?\d*')
+_CONTAINER_RE = re.compile(r'flow|data|river|discharge', re.I)
+_VAR_RE = re.compile(r'(var|let|const)\s+(\w+)\s*=\s*([^;]+);')
+
+# Decoder reused to pull JSON objects out of inline scripts with raw_decode
+_JSON_DECODER = json.JSONDecoder()
+
+# Tags inspected for data-* attributes, and how many to look at before giving up
+_DATA_ATTR_TAGS = ['div', 'span', 'td', 'p']
+_DATA_ATTR_SCAN_LIMIT = 500
+
+# Only build the parts of the DOM the scraper actually inspects
+_STRAINER = SoupStrainer(['table', 'div', 'span', 'p', 'script'])
+
+# Patterns like "X.X cms" or "X.X m³/s"
+_FLOW_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r'(\d+\.?\d*)\s*cms',
+        r'(\d+\.?\d*)\s*m³/s',
+        r'(\d+\.?\d*)\s*cubic\s+meters',
+    )
+]
+
 def scrape_transalta_flows():
     """Scrape flow data from TransAlta's river flows page"""
     print("=" * 80)
@@ -39,7 +64,8 @@ def scrape_transalta_flows():
             print(f"❌ Failed to fetch page")
             return None
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # Hand lxml the raw bytes so it does its own decoding
+        soup = BeautifulSoup(response.content, 'lxml', parse_only=_STRAINER)
         
         # Extract all flow data
         flow_data = {
@@ -76,36 +102,30 @@ def scrape_transalta_flows():
             table_data = []
             
             for row in rows[1:] if headers else rows:  # Skip header row if we found headers
-                cells = row.find_all(['td', 'th'])
-                row_data = [cell.get_text(strip=True) for cell in cells]
+                row_data = []
+                notes = []
                 
-                if row_data and any(row_data):  # Only add non-empty rows
-                    table_data.append(row_data)
+                # Extract text and identify facility/flow data in a single pass
+                for cell in row.find_all(['td', 'th']):
+                    text = cell.get_text(strip=True)
+                    row_data.append(text)
                     
-                    # Print the row
-                    row_str = " | ".join(row_data)
-                    print(f"   {row_str}")
+                    # Look for facility names
+                    lower = text.lower()
+                    if 'barrier' in lower:
+                        notes.append("      ✓ Found facility: Barrier")
+                    elif 'pocaterra' in lower:
+                        notes.append("      ✓ Found facility: Pocaterra")
                     
-                    # Try to identify facility and flow data
-                    for cell in row_data:
-                        # Look for facility names
-                        if 'barrier' in cell.lower():
-                            facility_name = 'Barrier'
-                            print(f"      ✓ Found facility: {facility_name}")
-                        elif 'pocaterra' in cell.lower():
-                            facility_name = 'Pocaterra'
-                            print(f"      ✓ Found facility: {facility_name}")
-                        
-                        # Look for numeric values (potential flow rates)
-                        numbers = re.findall(r'\d+\.?\d*', cell)
-                        if numbers:
-                            for num in numbers:
-                                try:
-                                    flow_value = float(num)
-                                    if 0 < flow_value < 1000:  # Reasonable flow range
-                                        print(f"      → Potential flow: {flow_value} m³/s")
-                                except ValueError:
-                                    pass
+                    # Look for numeric values (potential flow rates)
+                    for num in _NUM_RE.findall(text):
+                        flow_value = float(num)
+                        if 0 < flow_value < 1000:  # Reasonable flow range
+                            notes.append(f"      → Potential flow: {flow_value} m³/s")
+                
+                if any(row_data):  # Only add non-empty rows
+                    table_data.append(row_data)
+                    print("\n".join(["   " + " | ".join(row_data)] + notes))
             
             print()  # Blank line between tables
         
@@ -113,7 +133,7 @@ def scrape_transalta_flows():
         print("\n🔍 Searching for other data containers...")
         
         # Look for elements with common class names
-        data_containers = soup.find_all(['div', 'span', 'p'], class_=re.compile(r'flow|data|river|discharge', re.I))
+        data_containers = soup.find_all(['div', 'span', 'p'], class_=_CONTAINER_RE)
         
         for container in data_containers[:10]:  # Limit to first 10
             text = container.get_text(strip=True)
@@ -121,7 +141,7 @@ def scrape_transalta_flows():
                 print(f"   📦 {container.name}.{container.get('class', [''])[0]}: {text}")
                 
                 # Extract numbers
-                numbers = re.findall(r'\d+\.?\d*', text)
+                numbers = _NUM_RE.findall(text)
                 if numbers and any(keyword in text.lower() for keyword in ['cms', 'flow', 'discharge', 'barrier', 'pocaterra']):
                     print(f"      → Contains numbers: {numbers}")
         
@@ -137,24 +157,25 @@ def scrape_transalta_flows():
                 print(f"\n   📜 Script {i + 1} contains relevant keywords:")
                 
                 # Try to find JSON objects
-                json_matches = re.findall(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', script_text)
+                json_objects = (
+                    (parsed, raw) for parsed, raw in iter_json_objects(script_text)
+                    if any(keyword in raw.lower() for keyword in ['barrier', 'pocaterra', 'flow'])
+                )
                 
-                for j, json_str in enumerate(json_matches[:3]):  # Limit to first 3
-                    if any(keyword in json_str.lower() for keyword in ['barrier', 'pocaterra', 'flow']):
-                        print(f"\n      JSON Object {j + 1}:")
-                        try:
-                            # Try to parse it
-                            parsed = json.loads(json_str)
-                            print(f"      {json.dumps(parsed, indent=6)}")
-                        except:
-                            # Just show the raw string
-                            if len(json_str) < 500:
-                                print(f"      {json_str}")
-                            else:
-                                print(f"      {json_str[:500]}...")
+                for j, (parsed, raw) in enumerate(json_objects):
+                    if j >= 3:  # Limit to first 3
+                        break
+                    print(f"\n      JSON Object {j + 1}:")
+                    if parsed is not None:
+                        print(f"      {json.dumps(parsed, indent=6)}")
+                    elif len(raw) < 500:
+                        # JS object literal that isn't valid JSON; show the source
+                        print(f"      {raw}")
+                    else:
+                        print(f"      {raw[:500]}...")
                 
                 # Look for variable assignments with flow data
-                var_matches = re.findall(r'(var|let|const)\s+(\w+)\s*=\s*([^;]+);', script_text)
+                var_matches = _VAR_RE.findall(script_text)
                 for var_type, var_name, var_value in var_matches:
                     if any(keyword in var_name.lower() for keyword in ['flow', 'barrier', 'pocaterra', 'data']):
                         print(f"\n      Variable: {var_name}")
@@ -162,21 +183,25 @@ def scrape_transalta_flows():
         
         # Look for data attributes
         print("\n\n🔍 Searching for data attributes...")
-        elements_with_data = soup.find_all(attrs=lambda attrs: attrs and any(k.startswith('data-') for k in attrs.keys()))
+        # Only walk tags likely to carry flow data, and stop early
+        candidates = soup.find_all(_DATA_ATTR_TAGS, limit=_DATA_ATTR_SCAN_LIMIT)
+        seen = 0
         
-        for elem in elements_with_data[:20]:  # Limit to first 20
+        for elem in candidates:
             data_attrs = {k: v for k, v in elem.attrs.items() if k.startswith('data-')}
-            if data_attrs:
-                relevant = False
+            if not data_attrs:
+                continue
+            
+            seen += 1
+            if seen > 20:  # Limit to first 20
+                break
+            
+            if any(keyword in str(value).lower()
+                   for value in data_attrs.values()
+                   for keyword in ['flow', 'barrier', 'pocaterra', 'discharge']):
+                print(f"\n   {elem.name}:")
                 for key, value in data_attrs.items():
-                    if any(keyword in str(value).lower() for keyword in ['flow', 'barrier', 'pocaterra', 'discharge']):
-                        relevant = True
-                        break
-                
-                if relevant:
-                    print(f"\n   {elem.name}:")
-                    for key, value in data_attrs.items():
-                        print(f"      {key}: {value}")
+                    print(f"      {key}: {value}")
         
         return flow_data
         
@@ -186,17 +211,41 @@ def scrape_transalta_flows():
         traceback.print_exc()
         return None
 
+def iter_json_objects(text):
+    """Yield (parsed object or None, source text) for each brace-delimited object in text, left to right"""
+    i = 0
+    while True:
+        start = text.find('{', i)
+        if start < 0:
+            return
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            # Not valid JSON (e.g. a JS literal with unquoted keys); pass its source through
+            end = balanced_end(text, start)
+            if end is None:
+                i = start + 1
+                continue
+            obj = None
+        yield obj, text[start:end]
+        i = end
+
+def balanced_end(text, start):
+    """Return the index just past the brace that closes text[start], or None if it never closes"""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
 def extract_flow_values(text):
     """Extract flow values from text"""
-    # Look for patterns like "X.X cms" or "X.X m³/s"
-    patterns = [
-        r'(\d+\.?\d*)\s*cms',
-        r'(\d+\.?\d*)\s*m³/s',
-        r'(\d+\.?\d*)\s*cubic\s+meters',
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in _FLOW_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             return [float(m) for m in matches]
     
@@ -9,6 +9,35 @@ import sys
 import json
 from pathlib import Path
 
+def prompt_service_account():
+    """Prompt until a valid service account file is given; return (path, parsed JSON)."""
+    while True:
+        cred_path = input("Enter the path to your Firebase service account JSON file: ").strip()
+        if not cred_path:
+            print("❌ Please provide a valid path")
+            continue
+            
+        # Expand user path
+        cred_path = os.path.expanduser(cred_path)
+        
+        if os.path.exists(cred_path):
+            # Try to validate it's a valid Firebase service account file
+            try:
+                with open(cred_path, 'r') as f:
+                    data = json.load(f)
+                    if 'project_id' in data and 'private_key' in data:
+                        print(f"✅ Valid Firebase service account file found for project: {data['project_id']}")
+                        return cred_path, data
+                    else:
+                        print("❌ This doesn't appear to be a valid Firebase service account file")
+                        continue
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"❌ Error reading file: {e}")
+                continue
+        else:
+            print("❌ File not found. Please check the path and try again.")
+            continue
+
 def main():
     print("🔥 BrownClaw Admin Scripts Setup")
     print("=" * 40)
@@ -34,37 +63,11 @@ def main():
     print("3. Save the JSON file securely on your system")
     print()
     
-    # Get Firebase credentials path
-    while True:
-        cred_path = input("Enter the path to your Firebase service account JSON file: ").strip()
-        if not cred_path:
-            print("❌ Please provide a valid path")
-            continue
-            
-        # Expand user path
-        cred_path = os.path.expanduser(cred_path)
-        
-        if os.path.exists(cred_path):
-            # Try to validate it's a valid Firebase service account file
-            try:
-                with open(cred_path, 'r') as f:
-                    data = json.load(f)
-                    if 'project_id' in data and 'private_key' in data:
-                        project_id = data['project_id']
-                        print(f"✅ Valid Firebase service account file found for project: {project_id}")
-                        break
-                    else:
-                        print("❌ This doesn't appear to be a valid Firebase service account file")
-                        continue
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"❌ Error reading file: {e}")
-                continue
-        else:
-            print("❌ File not found. Please check the path and try again.")
-            continue
+    # Get Firebase credentials path (parsed once and reused below)
+    cred_path, data = prompt_service_account()
     
     # Get project ID (with default from the service account file)
-    default_project_id = data.get('project_id', 'brownclaw')
+    default_project_id = data['project_id']
     project_id_input = input(f"Enter Firebase project ID [{default_project_id}]: ").strip()
     project_id = project_id_input if project_id_input else default_project_id
     
@@ -6,11 +6,15 @@ This script updates station names using a combination of manual mappings and pat
 
 import os
 import sys
+import functools
+import itertools
 import logging
 from datetime import datetime, timezone
+from types import MappingProxyType
 from typing import Dict, List, Optional
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions, SendMode
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,61 +27,108 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Known station mappings from Canadian Water Service
+KNOWN_STATIONS = {
+    '02KF005': 'Ottawa River at Britannia',
+    '02KA006': 'Madawaska River at Arnprior', 
+    '02ED003': 'French River near Monetville',
+    '05BH004': 'Bow River at Calgary',
+    '05AD007': 'Kicking Horse River at Golden',
+    '05BJ004': 'Elbow River at Calgary',
+    '02KB001': 'Petawawa River near Petawawa',
+    '02KD007': 'Gatineau River near Ottawa',
+    '02KB008': 'Rouge River at Calumet',
+    '09AB004': 'Yukon River at Whitehorse',
+}
+
+# Pattern-based name generation
+PROVINCE_PATTERNS = MappingProxyType({
+    '01': 'Atlantic Canada',
+    '02': 'Quebec/Ontario',
+    '03': 'Ontario',
+    '04': 'Ontario',
+    '05': 'Prairie Provinces',
+    '06': 'Prairie Provinces', 
+    '07': 'British Columbia',
+    '08': 'British Columbia',
+    '09': 'Northern Canada',
+    '10': 'Arctic/Nunavut'
+})
+
+# River name patterns based on station ID patterns (region-specific)
+RIVER_PATTERNS = {
+    # Quebec/Ontario region (02)
+    '02': {
+        'KF': 'Ottawa River',
+        'KA': 'Madawaska River', 
+        'KB': 'Petawawa River',
+        'KD': 'Gatineau River',
+        'ED': 'French River',
+    },
+    # Prairie regions (05)
+    '05': {
+        'BH': 'Bow River',
+        'AD': 'Kicking Horse River',
+        'BJ': 'Elbow River',
+    },
+    # Northern Canada (09)
+    '09': {
+        'AB': 'Yukon River',
+    }
+}
+
+# Flattened 4-character prefix lookup, e.g. '02KF' -> 'Ottawa River'
+_PREFIX_TO_RIVER = {
+    f'{region}{sub}': name
+    for region, subs in RIVER_PATTERNS.items()
+    for sub, name in subs.items()
+}
+
+# Region code -> location used in generated names
+LOCATION_MAP = MappingProxyType({
+    '01': 'Atlantic Canada',
+    '02': 'Quebec',
+    '03': 'Ontario',
+    '04': 'Ontario',
+    '05': 'Alberta',
+    '06': 'Saskatchewan',
+    '07': 'British Columbia',
+    '08': 'British Columbia', 
+    '09': 'Yukon/NWT',
+    '10': 'Nunavut'
+})
+
+@functools.lru_cache(maxsize=None)
+def _generate_station_name(station_id: str) -> Optional[str]:
+    """Pure name generation over the module tables, memoized per station ID."""
+    # Check known stations first
+    if station_id in KNOWN_STATIONS:
+        return KNOWN_STATIONS[station_id]
+    
+    # Extract patterns from station ID
+    if len(station_id) >= 6:
+        location_name = LOCATION_MAP.get(station_id[:2], 'Canada')
+        
+        # Look for a river pattern specific to this region
+        river_name = _PREFIX_TO_RIVER.get(station_id[:4])
+        if river_name:
+            return f"{river_name} near {location_name}"
+        
+        # If no specific pattern matches, create generic but meaningful name
+        return f"Monitoring Station {station_id} - {location_name}"
+    
+    return None
+
+
 class StationNameMapper:
     def __init__(self):
         """Initialize the station name mapper."""
         self.db = None
         self.init_firebase()
         
-        # Known station mappings from Canadian Water Service
-        self.known_stations = {
-            '02KF005': 'Ottawa River at Britannia',
-            '02KA006': 'Madawaska River at Arnprior', 
-            '02ED003': 'French River near Monetville',
-            '05BH004': 'Bow River at Calgary',
-            '05AD007': 'Kicking Horse River at Golden',
-            '05BJ004': 'Elbow River at Calgary',
-            '02KB001': 'Petawawa River near Petawawa',
-            '02KD007': 'Gatineau River near Ottawa',
-            '02KB008': 'Rouge River at Calumet',
-            '09AB004': 'Yukon River at Whitehorse',
-        }
-        
-        # Pattern-based name generation
-        self.province_patterns = {
-            '01': 'Atlantic Canada',
-            '02': 'Quebec/Ontario',
-            '03': 'Ontario',
-            '04': 'Ontario',
-            '05': 'Prairie Provinces',
-            '06': 'Prairie Provinces', 
-            '07': 'British Columbia',
-            '08': 'British Columbia',
-            '09': 'Northern Canada',
-            '10': 'Arctic/Nunavut'
-        }
-        
-        # River name patterns based on station ID patterns (region-specific)
-        self.river_patterns = {
-            # Quebec/Ontario region (02)
-            '02': {
-                'KF': 'Ottawa River',
-                'KA': 'Madawaska River', 
-                'KB': 'Petawawa River',
-                'KD': 'Gatineau River',
-                'ED': 'French River',
-            },
-            # Prairie regions (05)
-            '05': {
-                'BH': 'Bow River',
-                'AD': 'Kicking Horse River',
-                'BJ': 'Elbow River',
-            },
-            # Northern Canada (09)
-            '09': {
-                'AB': 'Yukon River',
-            }
-        }
+        self.known_stations = KNOWN_STATIONS
+        self.province_patterns = PROVINCE_PATTERNS
+        self.river_patterns = RIVER_PATTERNS
         
     def init_firebase(self):
         """Initialize Firebase Admin SDK."""
@@ -104,65 +155,66 @@ class StationNameMapper:
     def generate_station_name(self, station_id: str) -> Optional[str]:
         """Generate a meaningful station name based on station ID patterns."""
         try:
-            # Check known stations first
-            if station_id in self.known_stations:
-                return self.known_stations[station_id]
-            
-            # Extract patterns from station ID
-            if len(station_id) >= 6:
-                region_code = station_id[:2]
-                sub_pattern = station_id[2:4]
-                
-                # Get region name
-                region_name = self.province_patterns.get(region_code, 'Canada')
-                
-                # Look for river patterns specific to this region
-                if region_code in self.river_patterns:
-                    region_patterns = self.river_patterns[region_code]
-                    for pattern, river_name in region_patterns.items():
-                        if pattern in sub_pattern:
-                            # Create a descriptive name
-                            station_num = station_id[4:] if len(station_id) > 4 else '001'
-                            location_name = self.get_location_name(region_code)
-                            return f"{river_name} near {location_name}"
-                
-                # If no specific pattern matches, create generic but meaningful name
-                location_name = self.get_location_name(region_code)
-                return f"Monitoring Station {station_id} - {location_name}"
-            
-            return None
-            
+            return _generate_station_name(station_id)
         except Exception as e:
             logger.debug(f"Error generating name for {station_id}: {e}")
             return None
     
     def get_location_name(self, region_code: str) -> str:
         """Get a location name based on region code."""
-        location_map = {
-            '01': 'Atlantic Canada',
-            '02': 'Quebec',
-            '03': 'Ontario',
-            '04': 'Ontario',
-            '05': 'Alberta',
-            '06': 'Saskatchewan',
-            '07': 'British Columbia',
-            '08': 'British Columbia', 
-            '09': 'Yukon/NWT',
-            '10': 'Nunavut'
-        }
-        return location_map.get(region_code, 'Canada')
+        return LOCATION_MAP.get(region_code, 'Canada')
     
-    def update_station_names(self):
-        """Update all station names in Firestore with better names."""
+    def update_station_names(self, full_scan: bool = False):
+        """Update station names in Firestore with better names.
+        
+        Only placeholder and empty names are fetched by default. Firestore can't
+        match docs with no name field, so full_scan reads every station instead.
+        """
         try:
             stations_ref = self.db.collection('water_stations')
-            docs = stations_ref.stream()
+            projected = stations_ref.select(['id', 'name'])
             
-            updated_count = 0
+            if full_scan:
+                docs = projected.stream()
+            else:
+                # Only pull docs that still need a name: placeholder "Station ..." names
+                # (prefix range query) and empty names
+                docs = itertools.chain(
+                    projected.where('name', '>=', 'Station ').where('name', '<', 'Station!').stream(),
+                    projected.where('name', '==', '').stream(),
+                )
+            
+            queued_count = 0
             total_count = 0
             
-            batch = self.db.batch()
-            batch_count = 0
+            # BulkWriter commits batches concurrently on its own thread pool, ramping
+            # from 500 ops/s towards Firestore's write ceiling, with exponential
+            # backoff on failed writes
+            bulk_writer = self.db.bulk_writer(options=BulkWriterOptions(
+                initial_ops_per_second=500,
+                max_ops_per_second=10000,
+                mode=SendMode.parallel,
+                retry=BulkRetry.exponential,
+            ))
+            
+            # close() doesn't raise on failed writes, so count outcomes from the callbacks
+            written = set()
+            write_failures = {}
+            
+            def on_write_error(error, _):
+                if error.attempts < 5:
+                    return True
+                write_failures[error.operation.reference.id] = error.message
+                return False
+            
+            bulk_writer.on_write_result(lambda reference, result, _: written.add(reference.id))
+            bulk_writer.on_write_error(on_write_error)
+            
+            # All updates in this run share one timestamp
+            run_ts = datetime.now(timezone.utc).isoformat()
+            
+            # Per-station lines are debug only; skip building them when silenced
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
             
             for doc in docs:
                 total_count += 1
@@ -178,36 +230,29 @@ class StationNameMapper:
                 new_name = self.generate_station_name(station_id)
                 
                 if new_name and new_name != current_name:
-                    # Add to batch update
                     doc_ref = stations_ref.document(doc.id)
-                    batch.update(doc_ref, {
+                    bulk_writer.update(doc_ref, {
                         'name': new_name,
-                        'updated_at': datetime.now(timezone.utc).isoformat(),
+                        'updated_at': run_ts,
                         'name_source': 'pattern_mapping'
                     })
                     
-                    batch_count += 1
-                    updated_count += 1
-                    
-                    logger.info(f"📝 {station_id}: {current_name} → {new_name}")
+                    queued_count += 1
                     
-                    # Commit batch every 100 updates
-                    if batch_count >= 100:
-                        batch.commit()
-                        logger.info(f"💾 Committed batch of {batch_count} updates")
-                        batch = self.db.batch()
-                        batch_count = 0
+                    if debug_enabled:
+                        logger.debug(f"📝 {station_id}: {current_name} → {new_name}")
                 
                 # Progress update
                 if total_count % 500 == 0:
-                    logger.info(f"📊 Processed {total_count} stations, updated {updated_count}")
+                    logger.info(f"📊 Processed {total_count} stations, queued {queued_count} updates")
             
-            # Commit remaining batch
-            if batch_count > 0:
-                batch.commit()
-                logger.info(f"💾 Committed final batch of {batch_count} updates")
+            # Wait for all pending writes
+            bulk_writer.close()
+            logger.info(f"💾 Flushed {len(written)} of {queued_count} updates")
+            for doc_id, message in write_failures.items():
+                logger.error(f"❌ {doc_id}: update failed: {message}")
             
-            logger.info(f"✅ Update complete! Processed {total_count} stations, updated {updated_count}")
+            logger.info(f"✅ Update complete! Processed {total_count} stations, updated {len(written)}, failed {len(write_failures)}")
             
         except Exception as e:
             logger.error(f"❌ Error updating station names: {e}")
@@ -217,19 +262,23 @@ class StationNameMapper:
         """Preview what names would be updated without making changes."""
         try:
             stations_ref = self.db.collection('water_stations')
-            docs = stations_ref.limit(limit).stream()
+            
+            # Fetch the whole preview page up front, then resolve each distinct ID once
+            rows = [doc.to_dict() for doc in stations_ref.select(['id', 'name']).limit(limit).get()]
+            new_names = {
+                station_id: self.generate_station_name(station_id)
+                for station_id in {row.get('id') for row in rows}
+            }
             
             logger.info(f"🔍 Preview of name updates (first {limit} stations):")
             logger.info("=" * 80)
             
             update_count = 0
             
-            for doc in docs:
-                station_data = doc.to_dict()
+            for station_data in rows:
                 station_id = station_data.get('id')
                 current_name = station_data.get('name', '')
-                
-                new_name = self.generate_station_name(station_id)
+                new_name = new_names[station_id]
                 
                 if new_name and new_name != current_name:
                     update_count += 1
@@ -240,7 +289,7 @@ class StationNameMapper:
                 else:
                     logger.info(f"⏭️  {station_id}: {current_name} (no change)")
             
-            logger.info(f"📊 Would update {update_count} out of {limit} stations previewed")
+            logger.info(f"📊 Would update {update_count} out of {len(rows)} stations previewed")
                 
         except Exception as e:
             logger.error(f"❌ Error previewing updates: {e}")
@@ -254,8 +303,11 @@ def main():
             limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
             logger.info(f"🔍 Previewing station name updates (limit: {limit})...")
             mapper.preview_updates(limit)
+        elif sys.argv[1] == '--full-scan':
+            logger.info("🚀 Starting station name updates (scanning every station)...")
+            mapper.update_station_names(full_scan=True)
         else:
-            logger.info("Usage: python3 station_name_mapper.py [--preview [limit]]")
+            logger.info("Usage: python3 station_name_mapper.py [--preview [limit] | --full-scan]")
     else:
         logger.info("🚀 Starting station name updates...")
         mapper.update_station_names()
@@ -3,75 +3,135 @@
 Test the updated LiveWaterDataService to ensure it works for all stations
 """
 
+import json
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import endpoints
+
+# Shared keep-alive session so repeated calls to the same host reuse connections
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+TEST_STATIONS = [
+    ('08NA011', 'BC', 'Spillimacheen River'),
+    ('08NB005', 'BC', 'Kicking Horse River'), 
+    ('05BH004', 'AB', 'Bow River at Calgary'),
+    ('02KF005', 'ON', 'Ottawa River')
+]
+
+# One worker per CSV and JSON request so every station is fetched at once
+EXECUTOR = ThreadPoolExecutor(max_workers=2 * len(TEST_STATIONS))
+
+# Number of trailing CSV bytes kept in memory when looking for the latest reading
+CSV_TAIL_BYTES = 64 * 1024
+
+def parse_reading(line):
+    """Return (timestamp, discharge) from a hydrometric CSV line, or None if it has no discharge"""
+    if line.strip() and not line.startswith('ID'):
+        parts = line.split(',')
+        if len(parts) >= 7:
+            discharge = parts[6]
+            if discharge and discharge.lower() != 'no data':
+                try:
+                    return parts[1], float(discharge)
+                except ValueError:
+                    pass
+    return None
+
+def latest_reading(body):
+    """Return the newest (timestamp, discharge) in a CSV body, scanning lines backwards from the end"""
+    end = len(body)
+    while end > 0:
+        start = body.rfind('\n', 0, end)
+        reading = parse_reading(body[start + 1:end])
+        if reading:
+            return reading
+        end = start
+    return None
+
+def fetch_csv_tail(url, timeout=15, max_bytes=CSV_TAIL_BYTES):
+    """Stream a CSV download, returning (status code, the trailing complete lines of the body)"""
+    with SESSION.get(url, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            return response.status_code, ''
+        
+        tail = b''
+        truncated = False
+        for chunk in response.iter_content(chunk_size=max_bytes):
+            tail += chunk
+            if len(tail) > max_bytes:
+                tail = tail[-max_bytes:]
+                truncated = True
+        
+        # Drop the partial line left at the front of a truncated tail
+        if truncated:
+            tail = tail[tail.find(b'\n') + 1:]
+        return response.status_code, tail.decode(response.encoding or 'utf-8', errors='replace')
+
+def fetch_json(url, timeout=10):
+    """GET a JSON endpoint, returning (status code, decoded body or None)"""
+    response = SESSION.get(url, timeout=timeout)
+    if response.status_code != 200:
+        return response.status_code, None
+    return response.status_code, json.loads(response.text)
+
+def fetch_pair(station):
+    """Submit the CSV and JSON requests for one station, returning both futures"""
+    station_id, province, _ = station
+    csv_url = f'https://dd.weather.gc.ca/hydrometric/csv/{province}/hourly/{province}_{station_id}_hourly_hydrometric.csv'
+    json_url = endpoints.WEATHER_GC_CA_TEMPLATE.format(sid=station_id)
+    return (
+        EXECUTOR.submit(fetch_csv_tail, csv_url, timeout=15),
+        EXECUTOR.submit(fetch_json, json_url, timeout=10),
+    )
 
 def test_new_approach():
     """Test that the CSV-first approach works for multiple stations"""
     
-    test_stations = [
-        ('08NA011', 'BC', 'Spillimacheen River'),
-        ('08NB005', 'BC', 'Kicking Horse River'), 
-        ('05BH004', 'AB', 'Bow River at Calgary'),
-        ('02KF005', 'ON', 'Ottawa River')
-    ]
-    
     print("🧪 TESTING NEW CSV-FIRST APPROACH")
     print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70)
     
-    for station_id, province, river_name in test_stations:
+    # Fire every CSV and JSON request up front; results are reported in order below
+    pending = {station[0]: fetch_pair(station) for station in TEST_STATIONS}
+    
+    for station_id, province, river_name in TEST_STATIONS:
         print(f"\n📍 Testing {station_id} - {river_name}")
         print("-" * 50)
         
-        # Test CSV Data Mart endpoint
-        csv_url = f'https://dd.weather.gc.ca/hydrometric/csv/{province}/hourly/{province}_{station_id}_hourly_hydrometric.csv'
+        csv_future, json_future = pending[station_id]
         
+        # Test CSV Data Mart endpoint
         try:
-            response = requests.get(csv_url, timeout=15)
+            status_code, tail = csv_future.result()
             
-            if response.status_code == 200:
-                lines = response.text.split('\n')
-                
+            if status_code == 200:
                 # Find latest data
-                for line in reversed(lines):
-                    if line.strip() and not line.startswith('ID'):
-                        parts = line.split(',')
-                        if len(parts) >= 7:
-                            timestamp = parts[1]
-                            discharge = parts[6]
-                            
-                            if discharge and discharge.lower() != 'no data':
-                                try:
-                                    flow_rate = float(discharge)
-                                    print(f"   ✅ CSV: {flow_rate} m³/s at {timestamp}")
-                                    
-                                    if station_id == '08NA011':
-                                        if 8 <= flow_rate <= 10:
-                                            print(f"   🎉 SPILLIMACHEEN FIXED! Now shows {flow_rate} instead of 34.8")
-                                        else:
-                                            print(f"   ⚠️  Unexpected value: {flow_rate}")
-                                    
-                                    break
-                                except ValueError:
-                                    pass
+                reading = latest_reading(tail)
+                if reading:
+                    timestamp, flow_rate = reading
+                    print(f"   ✅ CSV: {flow_rate} m³/s at {timestamp}")
+                    
+                    if station_id == '08NA011':
+                        if 8 <= flow_rate <= 10:
+                            print(f"   🎉 SPILLIMACHEEN FIXED! Now shows {flow_rate} instead of 34.8")
+                        else:
+                            print(f"   ⚠️  Unexpected value: {flow_rate}")
                 
             else:
-                print(f"   ❌ CSV endpoint failed: {response.status_code}")
+                print(f"   ❌ CSV endpoint failed: {status_code}")
                 
         except Exception as e:
             print(f"   ❌ CSV error: {e}")
         
         # Test JSON API (for comparison)
-        json_url = f'https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station_id}&limit=1&f=json'
-        
         try:
-            response = requests.get(json_url, timeout=10)
+            status_code, data = json_future.result()
             
-            if response.status_code == 200:
-                import json
-                data = json.loads(response.text)
-                
+            if status_code == 200:
                 if 'features' in data and data['features']:
                     feature = data['features'][0]
                     props = feature.get('properties', {})
@@ -88,7 +148,7 @@ def test_new_approach():
                 else:
                     print(f"   ❌ JSON: No features")
             else:
-                print(f"   ❌ JSON endpoint: {response.status_code}")
+                print(f"   ❌ JSON endpoint: {status_code}")
                 
         except Exception as e:
             print(f"   ❌ JSON error: {e}")
@@ -4,7 +4,20 @@ Test the NEW datamart URLs (changed October 7, 2025) for station 08NA011
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared keep-alive session so repeated calls to the same host reuse connections
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def head_all(urls, timeout=5):
+    """Issue HEAD requests for all URLs concurrently, returning futures in input order"""
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    probes = [executor.submit(SESSION.head, url, timeout=timeout, allow_redirects=True) for url in urls]
+    executor.shutdown(wait=False)
+    return probes
 
 def test_new_datamart_urls():
     """Test the updated datamart URLs announced on Oct 7, 2025"""
@@ -27,15 +40,19 @@ def test_new_datamart_urls():
         f"{new_base}/rt/{station_id}.csv",
     ]
     
-    for i, url in enumerate(test_urls, 1):
+    # HEAD-probe all candidates concurrently, then report them in order
+    probes = head_all(test_urls)
+    
+    for i, (url, probe) in enumerate(zip(test_urls, probes), 1):
         print(f"\n🔍 Test {i}: {url}")
         
         try:
-            response = requests.get(url, timeout=10)
+            response = probe.result()
             print(f"   📊 Status: {response.status_code}")
             
             if response.status_code == 200:
-                content = response.text
+                # Only download the body of a URL that exists
+                content = SESSION.get(url, timeout=10).text
                 lines = content.split('\n')
                 
                 print(f"   ✅ SUCCESS! {len(lines)} lines received")
@@ -69,12 +86,11 @@ def test_new_datamart_urls():
         f"{new_base}/real_time/",
     ]
     
-    for url in browse_urls:
+    for url, probe in zip(browse_urls, head_all(browse_urls)):
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
+            if probe.result().status_code == 200:
                 print(f"   ✅ {url} - Available")
-                content = response.text[:500]
+                content = SESSION.get(url, timeout=10).text[:500]
                 if '08NA011' in content:
                     print(f"   🎯 Found reference to our station!")
                 break
@@ -101,7 +117,7 @@ def test_original_web_service():
     
     for url in test_formats:
         try:
-            response = requests.get(url, timeout=10)
+            response = SESSION.get(url, timeout=10)
             print(f"   {url} - Status: {response.status_code}")
             if response.status_code == 200 and len(response.text) > 100:
                 print(f"   ✅ Got content ({len(response.text)} chars)")
@@ -5,10 +5,18 @@ Test real-time data fetching for favorite stations
 
 import requests
 from datetime import datetime
-import csv
+import bisect
 import json
+import functools
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 
+import endpoints
+import probe_cache
+from probe_common import SESSION, fast_json, timeout_for, pick_reading, latest_flow_rate
+
 # Test with some popular whitewater stations
 test_stations = [
     {'id': '05BH004', 'name': 'Bow River at Calgary'},
@@ -17,149 +25,200 @@ test_stations = [
     {'id': '08MF005', 'name': 'Fraser River at Hope'},
 ]
 
-def test_station_data(station_id, station_name):
+# Shared pool for the per-format probes of every station
+PROBE_EXECUTOR = ThreadPoolExecutor(max_workers=16)
+
+# Number of trailing CSV lines kept in memory when looking for the latest reading
+CSV_TAIL_LINES = 50
+
+# Structured per-format probe results, one JSON object per line; written to the
+# working directory unless a path is given on the command line
+RESULTS_FILE = 'realtime_api_results.jsonl'
+
+# Flow status buckets: FLOW_LABELS[i] applies below FLOW_THRESHOLDS[i]
+FLOW_THRESHOLDS = (10, 30, 100, 200)
+FLOW_LABELS = ('Too Low', 'Low', 'Good', 'High', 'Too High')
+
+def flow_status(flow_rate):
+    """Map a flow rate (m³/s) to its status label"""
+    return FLOW_LABELS[bisect.bisect_right(FLOW_THRESHOLDS, flow_rate)]
+
+def read_csv_tail(response, max_lines=CSV_TAIL_LINES):
+    """Stream a CSV response, keeping only the header, the last few lines and a line count"""
+    header = None
+    tail = deque(maxlen=max_lines)
+    line_count = 0
+    
+    if response.encoding is None:
+        response.encoding = 'utf-8'
+    
+    for line in response.iter_lines(decode_unicode=True):
+        if not line.strip():
+            continue
+        line_count += 1
+        if header is None:
+            header = line
+        else:
+            tail.append(line)
+    
+    return header, tail, line_count
+
+def test_station_data(station_id, station_name, out=None, results=None):
     """Test fetching real-time data for a specific station using multiple API formats"""
-    print(f"\n🌊 Testing {station_name} ({station_id})")
+    log = functools.partial(print, file=out)
+    if results is None:
+        results = []
+    log(f"\n🌊 Testing {station_name} ({station_id})")
     
     # Try multiple API formats based on research from other scripts
-    api_formats = [
-        # Original format that was working before
-        f'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={station_id}&parameters[]=47',
-        
-        # Alternative parameter formats
-        f'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations={station_id}&parameters=47',
-        f'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={station_id}',
-        f'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={station_id}&parameters[]=46', # water level
-        
-        # New Government of Canada JSON API (correct parameter name found!)
-        f'https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station_id}&limit=1&f=json',
-        
-        # MSC Datamart formats
-        f'https://dd.weather.gc.ca/today/hydrometric/csv/{station_id}_hourly.csv',
-        f'https://dd.weather.gc.ca/today/hydrometric/csv/{station_id}.csv',
-    ]
+    api_formats = endpoints.expand(endpoints.ALL_TEMPLATES, station_id)
     
-    for i, url in enumerate(api_formats, 1):
+    # Try the format that worked last run on its own before probing them all
+    cached_url = probe_cache.get_winner('test_realtime_api', station_id)
+    if cached_url in api_formats:
+        log("   💾 Trying cached working format first")
+        probe = PROBE_EXECUTOR.submit(fetch_format, cached_url)
         try:
-            print(f"   🧪 Format {i}: {url}")
-            response = requests.get(url, timeout=15, headers={'User-Agent': 'BrownClaw-Water-App/1.0'})
+            found = check_formats(station_id, [cached_url], [probe], log, results)
+        finally:
+            probe.add_done_callback(close_probe)
+        if found:
+            probe_cache.set_winner('test_realtime_api', station_id, cached_url)
+            return True
+        probe_cache.forget('test_realtime_api', station_id)
+    
+    # Probe every format at once; results are still checked in order
+    probes = [PROBE_EXECUTOR.submit(fetch_format, url) for url in api_formats]
+    try:
+        winning_url = check_formats(station_id, api_formats, probes, log, results)
+    finally:
+        # Drop probes that haven't started once a format has succeeded, and close the
+        # streamed responses of the rest (now or when they finish) to free their connections
+        for probe in probes:
+            if not probe.cancel():
+                probe.add_done_callback(close_probe)
+    
+    if winning_url:
+        probe_cache.set_winner('test_realtime_api', station_id, winning_url)
+        return True
+    return False
+
+def fetch_format(url):
+    """Start a streamed GET for one API format; the caller closes it (see close_probe)"""
+    return SESSION.get(url, timeout=timeout_for(url), stream=True)
+
+def close_probe(probe):
+    """Close a finished fetch_format probe's response, releasing its pooled connection"""
+    if probe.done() and not probe.cancelled() and not probe.exception():
+        probe.result().close()
+
+def check_formats(station_id, api_formats, probes, log, results):
+    """Report and record each probed format in order, returning the first URL with usable flow data (or None)"""
+    for i, (url, probe) in enumerate(zip(api_formats, probes), 1):
+        record = {'station': station_id, 'format': i, 'url': url, 'status': None, 'flow': None, 'latency_s': None}
+        results.append(record)
+        try:
+            log(f"   🧪 Format {i}: {url}")
+            response = probe.result()
+            record['status'] = response.status_code
+            record['latency_s'] = response.elapsed.total_seconds()
             
-            print(f"      Status: {response.status_code}")
+            log(f"      Status: {response.status_code}")
             
             if response.status_code == 200:
-                content = response.text.strip()
-                if not content:
-                    print(f"      ⚠️  Empty response")
-                    continue
-                    
                 # Handle JSON responses
                 if url.startswith('https://api.weather.gc.ca'):
+                    content = response.content
+                    if not content.strip():
+                        log("      ⚠️  Empty response")
+                        continue
+                    
                     try:
-                        json_data = json.loads(content)
+                        # Decode straight from bytes (orjson when available)
+                        json_data = fast_json.loads(content)
                         if 'features' in json_data and json_data['features']:
-                            print(f"      ✅ JSON response with {len(json_data['features'])} features")
-                            # Extract flow data from JSON
-                            for feature in json_data['features']:
-                                properties = feature.get('properties', {})
-                                station_name = properties.get('STATION_NAME', 'Unknown')
-                                discharge = properties.get('DISCHARGE')
-                                level = properties.get('LEVEL')
-                                datetime_str = properties.get('DATETIME_LST', properties.get('DATETIME'))
+                            log(f"      ✅ JSON response with {len(json_data['features'])} features")
+                            # Only the chosen feature is reported
+                            station_name, discharge, level, datetime_str = pick_reading(json_data['features'])
+                            
+                            log(f"      🏷️  Station: {station_name}")
+                            log(f"      📅 Time: {datetime_str}")
+                            
+                            if discharge is not None:
+                                flow_rate = float(discharge)
+                                record['flow'] = flow_rate
+                                log(f"      🌊 Discharge: {flow_rate} m³/s")
                                 
-                                print(f"      🏷️  Station: {station_name}")
-                                print(f"      📅 Time: {datetime_str}")
+                                status = flow_status(flow_rate)
                                 
-                                if discharge is not None:
-                                    flow_rate = float(discharge)
-                                    print(f"      🌊 Discharge: {flow_rate} m³/s")
-                                    
-                                    # Determine status
-                                    if flow_rate < 10:
-                                        status = "Too Low"
-                                    elif flow_rate < 30:
-                                        status = "Low"
-                                    elif flow_rate < 100:
-                                        status = "Good"
-                                    elif flow_rate < 200:
-                                        status = "High"
-                                    else:
-                                        status = "Too High"
-                                    
-                                    print(f"      🎯 Status: {status}")
-                                    print(f"      � SUCCESS! Found working Government of Canada API!")
-                                    return True
-                                elif level is not None:
-                                    water_level = float(level)
-                                    print(f"      📏 Water Level: {water_level} m")
-                                    print(f"      ℹ️  No discharge data, but level available")
-                                else:
-                                    print(f"      ⚠️  No discharge or level data in response")
+                                log(f"      🎯 Status: {status}")
+                                log("      � SUCCESS! Found working Government of Canada API!")
+                                return url
+                            elif level is not None:
+                                water_level = float(level)
+                                log(f"      📏 Water Level: {water_level} m")
+                                log("      ℹ️  No discharge data, but level available")
+                            else:
+                                log("      ⚠️  No discharge or level data in response")
                         else:
-                            print(f"      ⚠️  No features in JSON response")
+                            log("      ⚠️  No features in JSON response")
                         continue
                     except json.JSONDecodeError:
-                        print(f"      ⚠️  Invalid JSON response")
+                        log("      ⚠️  Invalid JSON response")
                         continue
                 
-                # Handle CSV responses
-                lines = content.split('\n')
-                print(f"      📄 CSV response has {len(lines)} lines")
+                # Handle CSV responses (streamed, only the tail is kept)
+                header, tail, line_count = read_csv_tail(response)
+                if not line_count:
+                    log("      ⚠️  Empty response")
+                    continue
+                
+                log(f"      📄 CSV response has {line_count} lines")
                 
-                if len(lines) >= 2:
+                if line_count >= 2:
                     # Parse the header
-                    header = lines[0]
-                    print(f"      📋 Header: {header[:80]}...")
+                    log(f"      📋 Header: {header[:80]}...")
                     
                     # Find the latest data
-                    for j in range(len(lines) - 1, 0, -1):
-                        line = lines[j].strip()
-                        if line and not line.startswith('#'):
-                            parts = [p.strip().strip('"') for p in line.split(',')]
-                            if len(parts) >= 3:
-                                flow_str = parts[2]
-                                if flow_str and flow_str.lower() not in ['no data', '', 'nan']:
-                                    try:
-                                        flow_rate = float(flow_str)
-                                        print(f"      ✅ Latest flow rate: {flow_rate} m³/s")
-                                        
-                                        # Determine status
-                                        if flow_rate < 10:
-                                            status = "Too Low"
-                                        elif flow_rate < 30:
-                                            status = "Low"
-                                        elif flow_rate < 100:
-                                            status = "Good"
-                                        elif flow_rate < 200:
-                                            status = "High"
-                                        else:
-                                            status = "Too High"
-                                        
-                                        print(f"      🎯 Status: {status}")
-                                        print(f"      🎉 SUCCESS! Found working API format!")
-                                        return True
-                                    except ValueError:
-                                        continue
+                    flow_rate = latest_flow_rate(tail)
+                    if flow_rate is not None:
+                        record['flow'] = flow_rate
+                        log(f"      ✅ Latest flow rate: {flow_rate} m³/s")
+                        
+                        status = flow_status(flow_rate)
+                        
+                        log(f"      🎯 Status: {status}")
+                        log("      🎉 SUCCESS! Found working API format!")
+                        return url
                     
-                    print(f"      ⚠️  No valid flow data found in CSV")
+                    log("      ⚠️  No valid flow data found in CSV")
                 else:
-                    print(f"      ⚠️  Insufficient data lines in CSV")
+                    log("      ⚠️  Insufficient data lines in CSV")
                     
             elif response.status_code == 422:
-                print(f"      ❌ HTTP 422 - Unprocessable Entity (API format/parameter issue)")
+                response.close()
+                log("      ❌ HTTP 422 - Unprocessable Entity (API format/parameter issue)")
             elif response.status_code == 404:
-                print(f"      ❌ HTTP 404 - Endpoint not found")
+                response.close()
+                log("      ❌ HTTP 404 - Endpoint not found")
             else:
-                print(f"      ❌ HTTP {response.status_code}")
+                log(f"      ❌ HTTP {response.status_code}")
                 if response.text and len(response.text) < 500:
-                    print(f"      💬 Response: {response.text}")
+                    log(f"      💬 Response: {response.text}")
         
         except requests.RequestException as e:
-            print(f"      ❌ Request failed: {e}")
+            log(f"      ❌ Request failed: {e}")
         
         except Exception as e:
-            print(f"      ❌ Error: {e}")
+            log(f"      ❌ Error: {e}")
     
-    return False
+    return None
+
+def save_results(results, filename=RESULTS_FILE):
+    """Write one JSON object per probed format (JSONL) in a single write"""
+    with open(filename, 'w') as f:
+        f.write(''.join(json.dumps(record) + '\n' for record in results))
+    print(f"\n💾 Probe results saved to: {filename}")
 
 def main():
     print("🧪 Testing Real-Time Water Data API - Enhanced Version")
@@ -174,9 +233,23 @@ def main():
     success_count = 0
     total_count = len(test_stations)
     
-    for station in test_stations:
-        if test_station_data(station['id'], station['name']):
-            success_count += 1
+    results = []
+    
+    def run(station):
+        # Buffer each station's output and records so concurrent runs don't interleave
+        out = StringIO()
+        records = []
+        success = test_station_data(station['id'], station['name'], out, records)
+        return success, out.getvalue(), records
+    
+    with ThreadPoolExecutor(max_workers=len(test_stations)) as executor:
+        for success, output, records in executor.map(run, test_stations):
+            print(output, end='')
+            results.extend(records)
+            if success:
+                success_count += 1
+    
+    save_results(results, sys.argv[1] if len(sys.argv) > 1 else RESULTS_FILE)
     
     print(f"\n📊 Results: {success_count}/{total_count} stations returned data")
     print("=" * 60)
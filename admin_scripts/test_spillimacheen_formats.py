@@ -5,6 +5,41 @@ Test format options for the working Spillimacheen station endpoint
 
 import requests
 import re
+import lxml.html
+
+from probe_common import SESSION, timeout_for
+
+# Precompiled HTML scanning patterns
+_CELL_NUMBER_RE = re.compile(r'\d+\.?\d*')
+_DECIMAL_RE = re.compile(r'(\d+\.\d+)')
+
+# Flow value patterns tried by extract_flow_from_html
+_FLOW_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r'<td[^>]*>\s*(\d+\.\d+)\s*</td>',  # Decimal numbers in table cells
+        r'Discharge[^>]*>([^<]*\d+[^<]*)',    # Discharge labels
+        r'Flow[^>]*>([^<]*\d+[^<]*)',         # Flow labels
+        r'(\d+\.\d+)\s*m³/s',               # Numbers followed by m³/s
+        r'(\d+\.\d+)\s*cubic',              # Numbers followed by cubic
+    )
+]
+
+def scan_html_tables(content):
+    """Parse the page once with lxml, returning (table count, numeric <td> values)"""
+    table_count = 0
+    numbers = []
+    
+    for element in lxml.html.fromstring(content).iter('table', 'td'):
+        if element.tag == 'table':
+            table_count += 1
+            continue
+        
+        text = element.text_content().strip()
+        if _CELL_NUMBER_RE.fullmatch(text):
+            numbers.append(float(text))
+    
+    return table_count, numbers
 
 def test_format_options():
     """Test different format parameters for station 08NA011"""
@@ -34,7 +69,7 @@ def test_format_options():
         print(f'   URL: {url}')
         
         try:
-            response = requests.get(url, timeout=10)
+            response = SESSION.get(url, timeout=timeout_for(url))
             status = response.status_code
             content_type = response.headers.get('content-type', 'unknown')
             size = len(response.text)
@@ -50,35 +85,26 @@ def test_format_options():
                 if content.startswith('<!DOCTYPE html') or '<html' in content[:100]:
                     print(f'   📄 HTML response')
                     
+                    lowered = content.lower()
+                    
                     # Look for embedded data or tables
-                    if 'spillimacheen' in content.lower():
+                    if 'spillimacheen' in lowered:
                         print(f'   ✅ Contains Spillimacheen data')
                         
-                        # Look for data tables
-                        table_pattern = r'<table[^>]*>.*?</table>'
-                        tables = re.findall(table_pattern, content, re.DOTALL | re.IGNORECASE)
-                        print(f'   📊 Found {len(tables)} tables')
+                        # Look for data tables and numeric cells in a single parse
+                        table_count, numbers = scan_html_tables(content)
+                        print(f'   📊 Found {table_count} tables')
                         
-                        # Look for numeric data that could be flow rates
-                        number_pattern = r'>\\s*(\\d+\\.?\\d*)\\s*</td>'
-                        numbers = re.findall(number_pattern, content)
                         if numbers:
                             # Filter for reasonable flow values (0.1 to 1000 m³/s)
-                            flow_candidates = []
-                            for n in numbers:
-                                try:
-                                    val = float(n)
-                                    if 0.1 <= val <= 1000:
-                                        flow_candidates.append(val)
-                                except:
-                                    continue
+                            flow_candidates = [val for val in numbers if 0.1 <= val <= 1000]
                             
                             if flow_candidates:
                                 print(f'   💧 Potential flows: {flow_candidates[:5]}')
                                 working_responses.append((url, content, flow_candidates))
                     
                     # Also look for "No Data" messages
-                    if 'no data' in content.lower() or 'not available' in content.lower():
+                    if 'no data' in lowered or 'not available' in lowered:
                         print(f'   ⚠️  Contains "no data" message')
                             
                 elif content.startswith('{') or content.strip().startswith('['):
@@ -109,21 +135,12 @@ def extract_flow_from_html(html_content):
     """Try to extract flow data from HTML response"""
     print('\n🔍 Attempting to extract flow data from HTML...')
     
-    # Look for table data with flow values
-    patterns = [
-        r'<td[^>]*>\\s*(\\d+\\.\\d+)\\s*</td>',  # Decimal numbers in table cells
-        r'Discharge[^>]*>([^<]*\\d+[^<]*)',      # Discharge labels
-        r'Flow[^>]*>([^<]*\\d+[^<]*)',           # Flow labels  
-        r'(\\d+\\.\\d+)\\s*m³/s',                # Numbers followed by m³/s
-        r'(\\d+\\.\\d+)\\s*cubic',               # Numbers followed by cubic
-    ]
-    
     all_matches = []
     
-    for pattern in patterns:
-        matches = re.findall(pattern, html_content, re.IGNORECASE)
+    for pattern in _FLOW_PATTERNS:
+        matches = pattern.findall(html_content)
         if matches:
-            print(f'   Pattern "{pattern}" found: {matches[:3]}')
+            print(f'   Pattern "{pattern.pattern}" found: {matches[:3]}')
             all_matches.extend(matches)
     
     # Try to find the most recent/relevant flow value
@@ -131,7 +148,7 @@ def extract_flow_from_html(html_content):
     for match in all_matches:
         try:
             # Extract just the numeric part
-            num_match = re.search(r'(\\d+\\.\\d+)', str(match))
+            num_match = _DECIMAL_RE.search(str(match))
             if num_match:
                 val = float(num_match.group(1))
                 if 0.01 <= val <= 1000:  # Reasonable range for flow
@@ -5,9 +5,25 @@ This station is confirmed to be online with continuous operation.
 """
 
 import requests
+import bisect
 import json
 from datetime import datetime
 
+import endpoints
+import probe_cache
+from probe_common import SESSION, fast_json, VERBOSE, timeout_for, body_snippet, pick_reading, latest_flow_rate
+
+# Trailing CSV lines searched for the latest reading
+CSV_TAIL_LINES = 32
+
+# Flow status buckets: FLOW_LABELS[i] applies below FLOW_THRESHOLDS[i]
+FLOW_THRESHOLDS = (5, 20, 50)
+FLOW_LABELS = ('Low', 'Good', 'High', 'Very High')
+
+def flow_status(flow_rate):
+    """Map a flow rate (m³/s) to its status label"""
+    return FLOW_LABELS[bisect.bisect_right(FLOW_THRESHOLDS, flow_rate)]
+
 def test_spillimacheen_station():
     """Test the Spillimacheen River station that should be online"""
     station_id = '08NA011'
@@ -18,22 +34,23 @@ def test_spillimacheen_station():
     print(f"🔄 Expected: Continuous operation with recent data")
     print("=" * 60)
     
-    # Test working Government of Canada API
-    formats = [
-        # New working Government of Canada JSON API 
-        f'https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station_id}&limit=1&f=json',
-        
-        # Legacy formats (for comparison - these should fail)
-        f'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]={station_id}&parameters[]=47',
-        f'https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations={station_id}&parameters=47',
-    ]
+    # Test working Government of Canada API, then legacy formats (for comparison - these should fail)
+    formats = endpoints.expand(
+        (endpoints.WEATHER_GC_CA_TEMPLATE,) + endpoints.REALTIME_CSV_TEMPLATES[:2],
+        station_id,
+    )
+    
+    # Try the format that worked last run first
+    cached_url = probe_cache.get_winner('test_spillimacheen_station', station_id)
+    formats.sort(key=lambda url: url != cached_url)
     
     for i, url in enumerate(formats, 1):
         print(f"\n🔍 Format {i}: Testing API endpoint...")
         print(f"   URL: {url}")
         
         try:
-            response = requests.get(url, timeout=15)
+            # Streamed so failing formats are closed without downloading their body
+            response = SESSION.get(url, timeout=timeout_for(url), stream=True)
             print(f"   📊 Status: {response.status_code}")
             
             if response.status_code == 200:
@@ -43,43 +60,32 @@ def test_spillimacheen_station():
                 # Handle JSON responses (new Government of Canada API)
                 if url.startswith('https://api.weather.gc.ca'):
                     try:
-                        json_data = json.loads(content)
+                        # Decode straight from bytes (orjson when available)
+                        json_data = fast_json.loads(response.content)
                         if 'features' in json_data and json_data['features']:
                             print(f"   📊 JSON response with {len(json_data['features'])} features")
-                            # Extract flow data from JSON
-                            for feature in json_data['features']:
-                                properties = feature.get('properties', {})
-                                station_name = properties.get('STATION_NAME', 'Unknown')
-                                discharge = properties.get('DISCHARGE')
-                                level = properties.get('LEVEL')
-                                datetime_str = properties.get('DATETIME_LST', properties.get('DATETIME'))
+                            # Only the chosen feature is reported
+                            station_name, discharge, level, datetime_str = pick_reading(json_data['features'])
+                            
+                            print(f"   🏷️  Station: {station_name}")
+                            print(f"   📅 Time: {datetime_str}")
+                            
+                            if discharge is not None:
+                                flow_rate = float(discharge)
+                                print(f"   🌊 Discharge: {flow_rate} m³/s")
                                 
-                                print(f"   🏷️  Station: {station_name}")
-                                print(f"   📅 Time: {datetime_str}")
+                                status = flow_status(flow_rate)
                                 
-                                if discharge is not None:
-                                    flow_rate = float(discharge)
-                                    print(f"   🌊 Discharge: {flow_rate} m³/s")
-                                    
-                                    # Determine status
-                                    if flow_rate < 5:
-                                        status = "Low"
-                                    elif flow_rate < 20:
-                                        status = "Good"
-                                    elif flow_rate < 50:
-                                        status = "High"
-                                    else:
-                                        status = "Very High"
-                                    
-                                    print(f"   🎯 Flow Status: {status}")
-                                    print(f"   🎉 SUCCESS! Station {station_id} is providing live data!")
-                                    return True
-                                elif level is not None:
-                                    water_level = float(level)
-                                    print(f"   📏 Water Level: {water_level} m")
-                                    print(f"   ℹ️  No discharge data, but level available")
-                                else:
-                                    print(f"   ⚠️  No discharge or level data in response")
+                                print(f"   🎯 Flow Status: {status}")
+                                print(f"   🎉 SUCCESS! Station {station_id} is providing live data!")
+                                probe_cache.set_winner('test_spillimacheen_station', station_id, url)
+                                return True
+                            elif level is not None:
+                                water_level = float(level)
+                                print(f"   📏 Water Level: {water_level} m")
+                                print(f"   ℹ️  No discharge data, but level available")
+                            else:
+                                print(f"   ⚠️  No discharge or level data in response")
                         else:
                             print(f"   ⚠️  No features in JSON response")
                     except json.JSONDecodeError:
@@ -88,60 +94,54 @@ def test_spillimacheen_station():
                 
                 # Handle CSV responses (legacy wateroffice API)
                 else:
-                    lines = content.split('\n')
-                    print(f"   📄 CSV response has {len(lines)} lines")
+                    line_count = content.count('\n') + 1
+                    print(f"   📄 CSV response has {line_count} lines")
                     
-                    if len(lines) >= 2:
-                        header = lines[0]
-                        print(f"   📋 Header: {header}")
+                    if line_count >= 2:
+                        if VERBOSE:
+                            header = content.partition('\n')[0]
+                            print(f"   📋 Header: {header}")
+                        
+                        # Readings are time-ordered, so the newest one is in the last few lines
+                        body = content.partition('\n')[2]
+                        tail = [line for line in body.rsplit('\n', CSV_TAIL_LINES)[-CSV_TAIL_LINES:]
+                                if line.strip() and not line.startswith('#')]
+                        if not tail:
+                            tail = [line for line in body.split('\n')
+                                    if line.strip() and not line.startswith('#')]
                         
-                        # Look for data lines
-                        data_found = False
-                        for line_num, line in enumerate(lines[1:], 1):
-                            line = line.strip()
-                            if line and not line.startswith('#'):
-                                parts = [p.strip().strip('"') for p in line.split(',')]
-                                if len(parts) >= 3:
-                                    flow_str = parts[2] if len(parts) > 2 else ''
-                                    if flow_str and flow_str.lower() not in ['no data', '', 'nan']:
-                                        try:
-                                            flow_rate = float(flow_str)
-                                            print(f"   🌊 Found flow data at line {line_num}: {flow_rate} m³/s")
-                                            data_found = True
-                                            
-                                            # Determine status
-                                            if flow_rate < 5:
-                                                status = "Low"
-                                            elif flow_rate < 20:
-                                                status = "Good"
-                                            elif flow_rate < 50:
-                                                status = "High"
-                                            else:
-                                                status = "Very High"
-                                            
-                                            print(f"   🎯 Flow Status: {status}")
-                                            print(f"   🎉 SUCCESS! Station {station_id} is providing live data!")
-                                            return True
-                                        except ValueError:
-                                            continue
+                        # Look for the latest data line
+                        flow_rate = latest_flow_rate(tail)
+                        if flow_rate is not None:
+                            print(f"   🌊 Latest flow data: {flow_rate} m³/s")
+                            
+                            status = flow_status(flow_rate)
+                            
+                            print(f"   🎯 Flow Status: {status}")
+                            print(f"   🎉 SUCCESS! Station {station_id} is providing live data!")
+                            probe_cache.set_winner('test_spillimacheen_station', station_id, url)
+                            return True
                         
-                        if not data_found:
-                            print(f"   ⚠️  No valid flow data found in CSV response")
+                        print(f"   ⚠️  No valid flow data found in CSV response")
                     else:
                         print(f"   ⚠️  Response too short, no data lines")
                     
             elif response.status_code == 422:
+                response.close()
                 print(f"   ❌ Unprocessable Entity - may be API format issue")
             else:
                 print(f"   ❌ Failed - HTTP {response.status_code}")
-                if response.text:
-                    print(f"   💬 Response: {response.text[:200]}")
+                snippet = body_snippet(response) if VERBOSE else ''
+                response.close()
+                if snippet:
+                    print(f"   💬 Response: {snippet}")
                     
         except requests.exceptions.Timeout:
-            print(f"   ⏰ Request timed out after 15 seconds")
+            print(f"   ⏰ Request timed out after {timeout_for(url)[1]} seconds")
         except Exception as e:
             print(f"   ❌ Error: {e}")
     
+    probe_cache.forget('test_spillimacheen_station', station_id)
     print(f"\n❌ All formats failed for station {station_id}")
     print(f"💡 This might indicate:")
     print(f"   • API service is temporarily down")
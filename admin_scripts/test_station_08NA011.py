@@ -3,11 +3,13 @@
 Test specific station 08NA011 that is known to be online
 """
 
-import requests
 from datetime import datetime
 import csv
 from io import StringIO
 
+import http_cache
+from probe_common import SESSION, VERBOSE, body_snippet
+
 def test_specific_station(station_id):
     """Test the specific station that should be online"""
     print(f"🌊 Testing station {station_id}")
@@ -17,27 +19,30 @@ def test_specific_station(station_id):
     print("1️⃣ Checking station in official list...")
     try:
         list_url = 'https://dd.weather.gc.ca/hydrometric/doc/hydrometric_StationList.csv'
-        response = requests.get(list_url, timeout=10)
+        # The station list is essentially static, so revalidate a cached copy
+        status, body = http_cache.conditional_get(SESSION, list_url, timeout=10)
         
-        if response.status_code == 200:
-            csv_data = StringIO(response.text)
-            reader = csv.DictReader(csv_data)
+        if status == 200:
+            rows = csv.reader(StringIO(body.decode('utf-8-sig', errors='replace')))
+            header = next(rows, [])
             
-            station_found = False
-            for row in reader:
-                if row.get('STATION_NUMBER', '').strip() == station_id:
-                    station_found = True
-                    print(f"   ✅ Found station: {row.get('STATION_NAME', 'Unknown')}")
-                    print(f"   📍 Location: {row.get('PROV_TERR_STATE_LOC', 'Unknown')}")
-                    print(f"   🔴 Real-time: {row.get('REAL_TIME', 'Unknown')}")
-                    print(f"   📊 Status: {row.get('HYD_STATUS', 'Unknown')}")
-                    break
+            # Compare only the station-number column; a dict is built just for the match
+            match = None
+            if 'STATION_NUMBER' in header:
+                number_col = header.index('STATION_NUMBER')
+                match = next((r for r in rows if len(r) > number_col and r[number_col].strip() == station_id), None)
             
-            if not station_found:
+            if match is None:
                 print(f"   ❌ Station {station_id} not found in official list")
                 return False
+            
+            row = dict(zip(header, match))
+            print(f"   ✅ Found station: {row.get('STATION_NAME', 'Unknown')}")
+            print(f"   📍 Location: {row.get('PROV_TERR_STATE_LOC', 'Unknown')}")
+            print(f"   🔴 Real-time: {row.get('REAL_TIME', 'Unknown')}")
+            print(f"   📊 Status: {row.get('HYD_STATUS', 'Unknown')}")
         else:
-            print(f"   ❌ Failed to get station list: HTTP {response.status_code}")
+            print(f"   ❌ Failed to get station list: HTTP {status}")
     except Exception as e:
         print(f"   ❌ Error checking station list: {e}")
     
@@ -58,24 +63,32 @@ def test_specific_station(station_id):
         print(f"   🧪 Format {i}: {url}")
         
         try:
-            response = requests.get(url, timeout=15)
+            response = SESSION.get(url, timeout=15, stream=True)
             print(f"      Status: {response.status_code}")
             
             if response.status_code == 200:
-                content = response.text
-                lines = content.split('\\n')
-                print(f"      ✅ Success! {len(lines)} lines returned")
+                # Stream the body; only the header and the first few data lines are kept
+                if response.encoding is None:
+                    response.encoding = 'utf-8'
+                lines = []
+                line_count = 0
+                for line in response.iter_lines(chunk_size=64 * 1024, decode_unicode=True):
+                    line_count += 1
+                    if line_count <= 6:
+                        lines.append(line)
+                print(f"      ✅ Success! {line_count} lines returned")
                 
-                if len(lines) >= 2:
-                    header = lines[0]
-                    print(f"      📋 Header: {header}")
+                if line_count >= 2:
+                    if VERBOSE:
+                        print(f"      📋 Header: {lines[0]}")
                     
                     # Look for actual data
                     data_found = False
                     for j in range(min(5, len(lines) - 1)):
                         line = lines[j + 1].strip()
                         if line and ',' in line:
-                            parts = [p.strip().strip('"') for p in line.split(',')]
+                            # The C csv parser handles quoting (including quoted commas)
+                            parts = next(csv.reader([line], skipinitialspace=True))
                             print(f"      📊 Sample data line {j+1}: {line[:100]}...")
                             
                             # Try to extract flow rate (usually column 2 or 3)
@@ -104,9 +117,12 @@ def test_specific_station(station_id):
                     print(f"      ⚠️  Insufficient data lines")
             elif response.status_code == 422:
                 print(f"      ❌ HTTP 422: Unprocessable Entity")
-                if response.text:
-                    print(f"      💬 Error: {response.text[:200]}")
+                snippet = body_snippet(response) if VERBOSE else ''
+                response.close()
+                if snippet:
+                    print(f"      💬 Error: {snippet}")
             else:
+                response.close()
                 print(f"      ❌ HTTP {response.status_code}")
                 
         except Exception as e:
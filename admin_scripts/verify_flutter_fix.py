@@ -3,10 +3,15 @@
 Verify the Flutter fix by calling the exact same API endpoints
 """
 
-import requests
-import json
+from collections import deque
 from datetime import datetime
 
+import gc_weather_client
+from probe_common import SESSION
+
+# Trailing CSV lines searched for the latest reading
+CSV_TAIL_LINES = 8
+
 def verify_flutter_fix():
     """Verify that the Flutter app will now get current data"""
     station_id = '08NA011'
@@ -17,17 +22,11 @@ def verify_flutter_fix():
     
     # Test the JSON API (should return old data)
     print("1. Testing JSON API (returns old data):")
-    json_url = f'https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station_id}&limit=1&f=json'
-    
     try:
-        response = requests.get(json_url, timeout=15)
-        if response.status_code == 200:
-            data = json.loads(response.text)
-            if 'features' in data and data['features']:
-                feature = data['features'][0]
-                props = feature.get('properties', {})
-                discharge = props.get('DISCHARGE')
-                timestamp = props.get('DATETIME_LST', props.get('DATETIME'))
+        status, reading = gc_weather_client.get_station_realtime(station_id)
+        if status == 200:
+            if reading:
+                _, discharge, _, timestamp = reading
                 
                 print(f"   ⚠️  Old JSON data: {discharge} m³/s at {timestamp}")
                 print(f"   📅 This is from: {timestamp[:10]} (outdated)")
@@ -43,28 +42,35 @@ def verify_flutter_fix():
     csv_url = f'https://dd.weather.gc.ca/hydrometric/csv/BC/hourly/BC_{station_id}_hourly_hydrometric.csv'
     
     try:
-        response = requests.get(csv_url, timeout=15)
+        response = SESSION.get(csv_url, timeout=15, stream=True)
         if response.status_code == 200:
-            lines = response.text.split('\n')
+            # Stream the body, keeping only the last few data lines in memory
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            lines = deque(
+                (line for line in response.iter_lines(chunk_size=64 * 1024, decode_unicode=True)
+                 if line.strip() and not line.startswith('ID')),
+                maxlen=CSV_TAIL_LINES,
+            )
             
             # Find latest data
+            today_str = datetime.now().strftime('%Y-%m-%d')
             for line in reversed(lines):
-                if line.strip() and not line.startswith('ID'):
-                    parts = line.split(',')
-                    if len(parts) >= 7:
-                        timestamp = parts[1]
-                        discharge = parts[6]
-                        
-                        print(f"   ✅ Current CSV data: {discharge} m³/s at {timestamp}")
-                        print(f"   📅 This is from: {timestamp[:10]} (current)")
-                        
-                        # Check if it's recent (today)
-                        if datetime.now().strftime('%Y-%m-%d') in timestamp:
-                            print(f"   🎉 DATA IS CURRENT! Flutter will show {discharge} m³/s")
-                        else:
-                            print(f"   ⚠️  Data is from {timestamp[:10]}")
-                        
-                        break
+                parts = line.split(',')
+                if len(parts) >= 7:
+                    timestamp = parts[1]
+                    discharge = parts[6]
+                    
+                    print(f"   ✅ Current CSV data: {discharge} m³/s at {timestamp}")
+                    print(f"   📅 This is from: {timestamp[:10]} (current)")
+                    
+                    # Check if it's recent (today)
+                    if timestamp.startswith(today_str):
+                        print(f"   🎉 DATA IS CURRENT! Flutter will show {discharge} m³/s")
+                    else:
+                        print(f"   ⚠️  Data is from {timestamp[:10]}")
+                    
+                    break
     except Exception as e:
         print(f"   ❌ CSV API error: {e}")
     
@@ -4,9 +4,14 @@ Test monthly mean data as a potential bridge between historical daily data and r
 Monthly data goes to 2024-12, which is more recent than daily-mean.
 """
 
-import requests
+import os
+import sys
 from datetime import datetime
 
+# Shared helpers live in admin_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'admin_scripts'))
+from gc_weather_client import get_items, get_station_monthly
+
 def test_monthly_data_coverage():
     """Test what monthly data is available"""
     station = "08NA011"
@@ -14,22 +19,17 @@ def test_monthly_data_coverage():
     print("🔍 Testing Monthly Mean Data Coverage")
     print("=" * 60)
     
-    # Get recent monthly data
-    url = f"https://api.weather.gc.ca/collections/hydrometric-monthly-mean/items?STATION_NUMBER={station}&limit=50&sortby=-DATE&f=json"
-    
-    print(f"📡 URL: {url}")
-    response = requests.get(url)
-    print(f"📊 Response status: {response.status_code}")
+    # Get monthly data from 2024 onwards (the years the report covers)
+    print(f"📡 Collection: hydrometric-monthly-mean from 2024-01-01")
+    status, features = get_station_monthly(station, start='2024-01-01')
+    print(f"📊 Response status: {status}")
     
-    if response.status_code == 200:
-        data = response.json()
-        features = data.get('features', [])
-        
+    if status == 200:
         print(f"🔍 Found {len(features)} monthly records")
         
         if features:
-            dates = []
             records_by_year = {}
+            newest = oldest = None
             
             for feature in features:
                 props = feature.get('properties', {})
@@ -37,21 +37,18 @@ def test_monthly_data_coverage():
                 discharge = props.get('MONTHLY_MEAN_DISCHARGE')
                 
                 if date_str and discharge is not None:
-                    year = date_str.split('-')[0]
-                    month = date_str.split('-')[1]
-                    
-                    if year not in records_by_year:
-                        records_by_year[year] = {}
-                    
-                    records_by_year[year][month] = {
+                    year, month = date_str[:4], date_str[5:7]
+                    records_by_year.setdefault(year, {})[month] = {
                         'discharge': discharge,
                         'date': date_str
                     }
-                    dates.append(date_str)
+                    
+                    # Features arrive newest first (sortby=-DATE), so no sort is needed
+                    newest = newest or date_str
+                    oldest = date_str
             
-            if dates:
-                dates.sort()
-                print(f"📅 Date range: {dates[0]} to {dates[-1]}")
+            if newest:
+                print(f"📅 Date range: {oldest} to {newest}")
                 
                 print(f"\n📊 Recent monthly data:")
                 for i, feature in enumerate(features[:12]):  # Show last 12 months
@@ -96,31 +93,30 @@ def test_daily_mean_2024_coverage():
     print(f"\n\n🔍 Testing Daily Mean 2024 Coverage")
     print("=" * 60)
     
-    url = f"https://api.weather.gc.ca/collections/hydrometric-daily-mean/items?STATION_NUMBER={station}&datetime=2024-01-01/2024-12-31&limit=1000&sortby=-DATE&f=json"
+    print(f"📡 Collection: hydrometric-daily-mean for 2024")
+    status, features = get_items(
+        'hydrometric-daily-mean',
+        STATION_NUMBER=station,
+        datetime='2024-01-01/2024-12-31',
+        limit=1000,
+        sortby='-DATE',
+        properties='DATE',
+        skipGeometry='true',
+    )
+    print(f"📊 Response status: {status}")
     
-    print(f"📡 URL: {url}")
-    response = requests.get(url)
-    print(f"📊 Response status: {response.status_code}")
-    
-    if response.status_code == 200:
-        data = response.json()
-        features = data.get('features', [])
-        
+    if status == 200:
         print(f"🔍 Found {len(features)} daily records for 2024")
         
         if features:
-            dates = []
-            for feature in features:
-                props = feature.get('properties', {})
-                date_str = props.get('DATE')
-                if date_str:
-                    dates.append(date_str)
+            dates = [feature.get('properties', {}).get('DATE') for feature in features]
+            dates = [date_str for date_str in dates if date_str]
             
-            dates.sort()
-            print(f"📅 Date range: {dates[0]} to {dates[-1]}")
+            # ISO dates compare correctly as strings, so no sort is needed
+            first_daily, last_daily = (min(dates), max(dates)) if dates else (None, None)
+            print(f"📅 Date range: {first_daily} to {last_daily}")
             
             # Show the gap
-            last_daily = dates[-1] if dates else None
             print(f"\n📊 Daily mean data ends: {last_daily}")
             print(f"📊 Real-time data starts: 2025-09-16 (30-day window)")
             
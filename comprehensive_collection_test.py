@@ -3,18 +3,29 @@
 Parse the available collections and test promising ones for recent data.
 """
 
-import requests
-import json
+import functools
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+# Shared helpers live in admin_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'admin_scripts'))
+import gc_weather_client
+from probe_common import SESSION
+
+# Shared pool for the per-URL probes of every collection
+PROBE_EXECUTOR = ThreadPoolExecutor(max_workers=16)
+
+# Collections probed at once; each fans out four URL variants onto PROBE_EXECUTOR
+MAX_COLLECTION_WORKERS = 8
 
 def get_collections():
     """Get all available collections and analyze them"""
     print("🔍 Getting all available collections...")
-    response = requests.get("https://api.weather.gc.ca/collections?f=json")
+    status, collections = gc_weather_client.get_collections()
     
-    if response.status_code == 200:
-        data = response.json()
-        collections = data.get('collections', [])
-        
+    if status == 200:
         print(f"📊 Found {len(collections)} collections:")
         print()
         
@@ -31,31 +42,32 @@ def get_collections():
     
     return []
 
-def test_collection_for_recent_data(collection_id):
+def test_collection_for_recent_data(collection_id, out=None):
     """Test a collection for recent data"""
+    log = functools.partial(print, file=out)
     station = "08NA011"
-    print(f"\n🔍 Testing {collection_id} for recent data...")
+    log(f"\n🔍 Testing {collection_id} for recent data...")
     
     # Try different approaches
     urls_to_try = [
-        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&limit=10&sortby=-DATE&f=json",
-        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&limit=10&sortby=-DATETIME&f=json", 
-        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&datetime=2024-01-01/2025-12-31&limit=10&f=json",
-        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&limit=10&f=json"
+        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&limit=10&sortby=-DATE&skipGeometry=true&f=json",
+        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&limit=10&sortby=-DATETIME&skipGeometry=true&f=json", 
+        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&datetime=2024-01-01/2025-12-31&limit=10&skipGeometry=true&f=json",
+        f"https://api.weather.gc.ca/collections/{collection_id}/items?STATION_NUMBER={station}&limit=10&skipGeometry=true&f=json"
     ]
     
-    for i, url in enumerate(urls_to_try):
-        try:
-            print(f"  📡 Attempt {i+1}: {url}")
-            response = requests.get(url, timeout=10)
+    # Fire every variant at once; results are still checked in order
+    probes = [PROBE_EXECUTOR.submit(gc_weather_client.get_features, url, 10) for url in urls_to_try]
+    try:
+        for i, (url, probe) in enumerate(zip(urls_to_try, probes)):
+            try:
+                log(f"  📡 Attempt {i+1}: {url}")
+                status, features = probe.result()
             
-            if response.status_code == 200:
-                data = response.json()
-                if 'features' in data:
-                    features = data['features']
+                if status == 200:
                     if features:
-                        print(f"  ✅ Found {len(features)} records")
-                        
+                        log(f"  ✅ Found {len(features)} records")
+                    
                         # Extract dates
                         dates = []
                         for feature in features:
@@ -63,26 +75,28 @@ def test_collection_for_recent_data(collection_id):
                             date_val = props.get('DATE') or props.get('DATETIME') or props.get('date')
                             if date_val:
                                 dates.append(date_val)
-                        
+                    
                         if dates:
                             dates.sort()
-                            print(f"  📅 Date range: {dates[0]} to {dates[-1]}")
-                            
+                            log(f"  📅 Date range: {dates[0]} to {dates[-1]}")
+                        
                             # Show most recent record
                             latest_feature = features[0]
                             props = latest_feature.get('properties', {})
-                            print(f"  📊 Latest record: {props}")
+                            log(f"  📊 Latest record: {props}")
                             return True
                         break
                     else:
-                        print(f"  ⚠️ No records found")
+                        log(f"  ⚠️ No records found")
                 else:
-                    print(f"  ❓ Unexpected response structure")
-            else:
-                print(f"  ❌ HTTP {response.status_code}")
+                    log(f"  ❌ HTTP {status}")
                 
-        except Exception as e:
-            print(f"  ❌ Error: {e}")
+            except Exception as e:
+                log(f"  ❌ Error: {e}")
+    finally:
+        # Drop requests that haven't started once a variant has succeeded
+        for probe in probes:
+            probe.cancel()
     
     return False
 
@@ -101,11 +115,17 @@ def main():
     print("🔍 Testing each hydrometric collection for recent data...")
     print("="*60)
     
+    def run(collection):
+        # Buffer each collection's output so concurrent runs don't interleave
+        out = StringIO()
+        return collection['id'], test_collection_for_recent_data(collection['id'], out), out.getvalue()
+    
     promising_collections = []
-    for collection in collections:
-        collection_id = collection['id']
-        if test_collection_for_recent_data(collection_id):
-            promising_collections.append(collection_id)
+    with ThreadPoolExecutor(max_workers=min(MAX_COLLECTION_WORKERS, len(collections))) as executor:
+        for collection_id, found, output in executor.map(run, collections):
+            print(output, end='')
+            if found:
+                promising_collections.append(collection_id)
     
     print(f"\n📋 Summary of promising collections:")
     for collection_id in promising_collections:
@@ -120,7 +140,7 @@ def main():
         # This is the API that the government's own website uses
         url = "https://wateroffice.ec.gc.ca/services/real_time_data/csv/inline?stations[]=08NA011"
         print(f"📡 URL: {url}")
-        response = requests.get(url, timeout=10)
+        response = SESSION.get(url, timeout=10)
         print(f"📊 Response status: {response.status_code}")
         
         if response.status_code == 200:
@@ -130,7 +150,7 @@ def main():
             for i, line in enumerate(lines):
                 print(f"  [{i}] {line}")
         else:
-            print(f"❌ Failed: {response.text[:200]}")
+            print(f"❌ Failed: {response.content[:200].decode('utf-8', errors='replace')}")
     except Exception as e:
         print(f"❌ Error testing Water Office API: {e}")
 
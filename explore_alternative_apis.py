@@ -5,28 +5,53 @@ to bridge the gap between historical daily-mean and real-time data.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import functools
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from io import StringIO
+
+# Shared helpers live in admin_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'admin_scripts'))
+import http_cache
 
 # Test station
 STATION = "08NA011"
 
-def test_api_endpoint(name, url, description):
-    """Test an API endpoint and report findings"""
-    print(f"\n🔍 Testing: {name}")
-    print(f"📝 Description: {description}")
-    print(f"📡 URL: {url}")
+# Shared keep-alive session; retries throttling and transient server errors with backoff
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+# Endpoints probed at once; kept low to stay within the API's rate limits
+MAX_WORKERS = 4
+
+# Collection metadata is effectively static; reuse a cached copy for a day without asking
+COLLECTIONS_MAX_AGE = 24 * 3600
+
+def test_api_endpoint(name, url, description, max_age=None):
+    """Test an API endpoint and return the report text"""
+    out = StringIO()
+    log = functools.partial(print, file=out)
+    log(f"\n🔍 Testing: {name}")
+    log(f"📝 Description: {description}")
+    log(f"📡 URL: {url}")
     
     try:
-        response = requests.get(url, timeout=10)
-        print(f"📊 Response status: {response.status_code}")
+        status, body = http_cache.conditional_get(SESSION, url, max_age=max_age, timeout=10)
+        log(f"📊 Response status: {status}")
         
-        if response.status_code == 200:
+        if status == 200:
             try:
-                data = response.json()
+                data = json.loads(body)
                 if 'features' in data:
                     features = data['features']
-                    print(f"🔍 Found {len(features)} records")
+                    log(f"🔍 Found {len(features)} records")
                     
                     if features:
                         # Show date range
@@ -39,100 +64,110 @@ def test_api_endpoint(name, url, description):
                         
                         if dates:
                             dates.sort()
-                            print(f"📅 Date range: {dates[0]} to {dates[-1]}")
+                            log(f"📅 Date range: {dates[0]} to {dates[-1]}")
                         
                         # Show sample data
-                        print("📊 Sample records:")
+                        log("📊 Sample records:")
                         for i, feature in enumerate(features[:5]):
                             props = feature.get('properties', {})
-                            print(f"  [{i}] {props}")
+                            log(f"  [{i}] {props}")
                             
                 elif 'items' in data:
                     items = data['items']
-                    print(f"🔍 Found {len(items)} records")
+                    log(f"🔍 Found {len(items)} records")
                     
                     if items:
                         # Show sample data
-                        print("📊 Sample records:")
+                        log("📊 Sample records:")
                         for i, item in enumerate(items[:5]):
-                            print(f"  [{i}] {item}")
+                            log(f"  [{i}] {item}")
                 else:
-                    print(f"📄 Response keys: {list(data.keys())}")
-                    print(f"📊 Sample data: {str(data)[:500]}...")
+                    log(f"📄 Response keys: {list(data.keys())}")
+                    log(f"📊 Sample data: {str(data)[:500]}...")
                     
-            except json.JSONDecodeError:
-                print(f"📄 Non-JSON response: {response.text[:500]}...")
+            except ValueError:
+                log(f"📄 Non-JSON response: {body[:500].decode('utf-8', errors='replace')}...")
                 
         else:
-            print(f"❌ HTTP Error: {response.status_code}")
-            print(f"📄 Response: {response.text[:200]}...")
+            log(f"❌ HTTP Error: {status}")
+            log(f"📄 Response: {body[:200].decode('utf-8', errors='replace')}...")
             
     except Exception as e:
-        print(f"❌ Request failed: {str(e)}")
+        log(f"❌ Request failed: {str(e)}")
     
-    print("-" * 60)
+    log("-" * 60)
+    return out.getvalue()
 
 def main():
     print("🌊 Exploring Alternative Government of Canada Water Data APIs")
     print("=" * 80)
     
-    # 1. Try monthly mean data
-    test_api_endpoint(
-        "Monthly Mean Data",
-        f"https://api.weather.gc.ca/collections/hydrometric-monthly-mean/items?STATION_NUMBER={STATION}&limit=100&f=json",
-        "Monthly mean discharge values - might have more recent data than daily-mean"
-    )
-    
-    # 2. Try annual statistics  
-    test_api_endpoint(
-        "Annual Statistics",
-        f"https://api.weather.gc.ca/collections/hydrometric-annual-statistics/items?STATION_NUMBER={STATION}&limit=100&f=json",
-        "Annual statistics - might have 2024 summary data"
-    )
-    
-    # 3. Try historical data collection (different endpoint)
-    test_api_endpoint(
-        "Historical Collection",
-        f"https://api.weather.gc.ca/collections/hydrometric-historical/items?STATION_NUMBER={STATION}&limit=100&f=json",
-        "Historical collection - might be different from daily-mean"
-    )
-    
-    # 4. Try archive collection
-    test_api_endpoint(
-        "Archive Collection", 
-        f"https://api.weather.gc.ca/collections/hydrometric-archive/items?STATION_NUMBER={STATION}&limit=100&f=json",
-        "Archive collection - might have more recent archived data"
-    )
-    
-    # 5. Try different date range on daily-mean to see if 2025 data exists
-    test_api_endpoint(
-        "Daily Mean 2025 Test",
-        f"https://api.weather.gc.ca/collections/hydrometric-daily-mean/items?STATION_NUMBER={STATION}&datetime=2025-01-01/2025-12-31&limit=100&f=json",
-        "Testing if daily-mean has any 2025 data we missed"
-    )
-    
-    # 6. Try recent daily-mean data (last 90 days)
     end_date = datetime.now().strftime('%Y-%m-%d')
     start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
-    test_api_endpoint(
-        "Recent Daily Mean (90 days)",
-        f"https://api.weather.gc.ca/collections/hydrometric-daily-mean/items?STATION_NUMBER={STATION}&datetime={start_date}/{end_date}&limit=100&sortby=-DATE&f=json",
-        "Testing for very recent daily-mean data"
-    )
     
-    # 7. Try different real-time parameters to see if we can get more data
-    test_api_endpoint(
-        "Real-time with different params",
-        f"https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={STATION}&limit=10000&sortby=DATETIME&f=json",
-        "Testing real-time with more records and ascending sort"
-    )
+    tests = [
+        # 1. Try monthly mean data
+        (
+            "Monthly Mean Data",
+            f"https://api.weather.gc.ca/collections/hydrometric-monthly-mean/items?STATION_NUMBER={STATION}&limit=100&f=json",
+            "Monthly mean discharge values - might have more recent data than daily-mean"
+        ),
+
+        # 2. Try annual statistics  
+        (
+            "Annual Statistics",
+            f"https://api.weather.gc.ca/collections/hydrometric-annual-statistics/items?STATION_NUMBER={STATION}&limit=100&f=json",
+            "Annual statistics - might have 2024 summary data"
+        ),
+
+        # 3. Try historical data collection (different endpoint)
+        (
+            "Historical Collection",
+            f"https://api.weather.gc.ca/collections/hydrometric-historical/items?STATION_NUMBER={STATION}&limit=100&f=json",
+            "Historical collection - might be different from daily-mean"
+        ),
+
+        # 4. Try archive collection
+        (
+            "Archive Collection", 
+            f"https://api.weather.gc.ca/collections/hydrometric-archive/items?STATION_NUMBER={STATION}&limit=100&f=json",
+            "Archive collection - might have more recent archived data"
+        ),
+
+        # 5. Try different date range on daily-mean to see if 2025 data exists
+        (
+            "Daily Mean 2025 Test",
+            f"https://api.weather.gc.ca/collections/hydrometric-daily-mean/items?STATION_NUMBER={STATION}&datetime=2025-01-01/2025-12-31&limit=100&f=json",
+            "Testing if daily-mean has any 2025 data we missed"
+        ),
+
+        # 6. Try recent daily-mean data (last 90 days)
+        (
+            "Recent Daily Mean (90 days)",
+            f"https://api.weather.gc.ca/collections/hydrometric-daily-mean/items?STATION_NUMBER={STATION}&datetime={start_date}/{end_date}&limit=100&sortby=-DATE&f=json",
+            "Testing for very recent daily-mean data"
+        ),
+
+        # 7. Try different real-time parameters to see if we can get more data
+        (
+            "Real-time with different params",
+            f"https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={STATION}&limit=10000&sortby=DATETIME&f=json",
+            "Testing real-time with more records and ascending sort"
+        ),
+
+        # 8. Check what collections are available
+        (
+            "Available Collections",
+            "https://api.weather.gc.ca/collections?f=json",
+            "List all available hydrometric collections",
+            COLLECTIONS_MAX_AGE,
+        ),
+    ]
     
-    # 8. Check what collections are available
-    test_api_endpoint(
-        "Available Collections",
-        "https://api.weather.gc.ca/collections?f=json",
-        "List all available hydrometric collections"
-    )
+    # The probes are independent; run them concurrently and print each report in order
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for report in executor.map(lambda test: test_api_endpoint(*test), tests):
+            print(report, end='')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,13 +2,22 @@
 """
 Find the correct river run IDs for default favorites.
 Searches for Kananaskis River and Harvie Passage in Firestore.
+
+Set FIRESTORE_EMULATOR_HOST=localhost:8080 to run against the local emulator
+(seed it with python_scripts/seed_emulator.py) instead of production.
 """
 
+import os
+
 import firebase_admin
 from firebase_admin import credentials, firestore
 
 # Initialize Firebase Admin
-firebase_admin.initialize_app()
+if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+    print(f"🧪 Using Firestore emulator at {os.environ['FIRESTORE_EMULATOR_HOST']}")
+    firebase_admin.initialize_app(options={'projectId': 'brownclaw'})
+else:
+    firebase_admin.initialize_app()
 
 db = firestore.client()
 
@@ -16,51 +25,48 @@ print("=" * 60)
 print("Searching for default favorite river runs...")
 print("=" * 60)
 
-# Search for Kananaskis River
-print("\n🔍 Searching for Kananaskis River...")
-kananaskis_runs = []
-runs_ref = db.collection('river_runs')
-
-for doc in runs_ref.stream():
-    data = doc.to_dict()
-    name = (data.get('name') or '').lower()
-    river = (data.get('river') or '').lower()
-    location = (data.get('location') or '').lower()
-    
-    if 'kananaskis' in name or 'kananaskis' in river:
-        kananaskis_runs.append({
+def match_runs(docs):
+    """Split run documents into (kananaskis runs, harvie runs) by substring match on their fields"""
+    kananaskis_runs = []
+    harvie_runs = []
+    for doc in docs:
+        data = doc.to_dict()
+        name = (data.get('name') or '').lower()
+        river = (data.get('river') or '').lower()
+        location = (data.get('location') or '').lower()
+        run = {
             'id': doc.id,
             'name': data.get('name'),
             'river': data.get('river'),
             'difficulty': data.get('difficulty'),
-        })
-        print(f"  ✅ Found: {doc.id}")
-        print(f"     Name: {data.get('name')}")
-        print(f"     River: {data.get('river')}")
-        print(f"     Difficulty: {data.get('difficulty')}")
-        print()
+        }
+        
+        if 'kananaskis' in name or 'kananaskis' in river:
+            kananaskis_runs.append(run)
+        if 'harvie' in name or 'harvie' in location or ('bow' in river and 'harvie' in name):
+            harvie_runs.append(run)
+    return kananaskis_runs, harvie_runs
 
-# Search for Harvie Passage
-print("\n🔍 Searching for Harvie Passage...")
-harvie_runs = []
+# Runs carry name_tokens (see python_scripts/add_name_tokens.py), so candidates come
+# back from one indexed array_contains_any query; match_runs then applies the substring checks
+runs_ref = db.collection('river_runs').select(['name', 'river', 'location', 'difficulty'])
+kananaskis_runs, harvie_runs = match_runs(
+    runs_ref.where('name_tokens', 'array_contains_any', ['kananaskis', 'harvie']).stream()
+)
 
-for doc in runs_ref.stream():
-    data = doc.to_dict()
-    name = (data.get('name') or '').lower()
-    river = (data.get('river') or '').lower()
-    location = (data.get('location') or '').lower()
-    
-    if 'harvie' in name or 'harvie' in location or ('bow' in river and 'harvie' in name):
-        harvie_runs.append({
-            'id': doc.id,
-            'name': data.get('name'),
-            'river': data.get('river'),
-            'difficulty': data.get('difficulty'),
-        })
-        print(f"  ✅ Found: {doc.id}")
-        print(f"     Name: {data.get('name')}")
-        print(f"     River: {data.get('river')}")
-        print(f"     Difficulty: {data.get('difficulty')}")
+# Runs without tokens (not yet backfilled) or matching only inside a longer word
+# are invisible to that query, so scan the projected collection if it missed either
+if not kananaskis_runs or not harvie_runs:
+    print("⚠️  Token query missed a favorite; scanning river_runs instead")
+    kananaskis_runs, harvie_runs = match_runs(runs_ref.stream())
+
+for title, runs in (("Kananaskis River", kananaskis_runs), ("Harvie Passage", harvie_runs)):
+    print(f"\n🔍 Searching for {title}...")
+    for run in runs:
+        print(f"  ✅ Found: {run['id']}")
+        print(f"     Name: {run['name']}")
+        print(f"     River: {run['river']}")
+        print(f"     Difficulty: {run['difficulty']}")
         print()
 
 # Summary
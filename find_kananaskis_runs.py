@@ -1,35 +1,63 @@
 #!/usr/bin/env python3
-"""Find all Kananaskis river runs in the database"""
+"""Find all Kananaskis river runs in the database
+
+Set FIRESTORE_EMULATOR_HOST=localhost:8080 to run against the local emulator
+(seed it with python_scripts/seed_emulator.py) instead of production.
+"""
 
 import firebase_admin
 from firebase_admin import credentials, firestore
 import os
 
-# Initialize Firebase Admin SDK
-service_account_path = 'admin_scripts/service_account_key.json'
-if not os.path.exists(service_account_path):
-    service_account_path = 'serviceAccountKey.json'
-
-cred = credentials.Certificate(service_account_path)
-firebase_admin.initialize_app(cred)
+# Initialize Firebase Admin SDK once; prefer Application Default Credentials when configured
+if not firebase_admin._apps:
+    if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        print(f"🧪 Using Firestore emulator at {os.environ['FIRESTORE_EMULATOR_HOST']}")
+        firebase_admin.initialize_app(options={'projectId': 'brownclaw'})
+    elif os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'):
+        firebase_admin.initialize_app()
+    else:
+        service_account_path = 'admin_scripts/service_account_key.json'
+        if not os.path.exists(service_account_path):
+            service_account_path = 'serviceAccountKey.json'
+        
+        cred = credentials.Certificate(service_account_path)
+        firebase_admin.initialize_app(cred)
 
 db = firestore.client()
 
+# Documents fetched per query page
+PAGE_SIZE = 500
+
+def paginate(query, page_size=PAGE_SIZE):
+    """Yield a query's documents in cursor-paged get() calls instead of one long-lived stream"""
+    last = None
+    while True:
+        page = query.limit(page_size)
+        if last is not None:
+            page = page.start_after(last)
+        docs = page.get()
+        yield from docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
 print("Searching for Kananaskis river runs...")
 print("=" * 60)
 
-# Search for river runs containing "kananaskis" (case-insensitive search)
-all_runs = db.collection('river_runs').stream()
+# Search for river runs containing "kananaskis" (case-insensitive search).
+# Firestore has no substring index, so scan once but only fetch the fields used below.
+all_runs = paginate(
+    db.collection('river_runs')
+    .select(['name', 'river', 'location', 'hasValidStation', 'stationId'])
+)
 
 kananaskis_runs = []
 for run in all_runs:
     run_data = run.to_dict()
-    name = run_data.get('name', '').lower()
-    river = run_data.get('river', '').lower()
-    location = run_data.get('location', '').lower()
     
-    # Check if any field contains "kananaskis"
-    if 'kananaskis' in name or 'kananaskis' in river or 'kananaskis' in location:
+    # Check if any field contains "kananaskis"; stops lowercasing at the first match
+    if any('kananaskis' in (run_data.get(field) or '').lower() for field in ('name', 'river', 'location')):
         kananaskis_runs.append({
             'id': run.id,
             'name': run_data.get('name'),
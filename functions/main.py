@@ -3,24 +3,67 @@
 
 from firebase_functions import https_fn, options
 from firebase_admin import initialize_app, firestore, auth
-import stripe
+from google.api_core.exceptions import AlreadyExists
+import functools
 import json
 import os
+from datetime import datetime, timedelta, timezone
 from typing import Any
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env for local runs; deployed functions
+# (K_SERVICE set) already get them from the Firebase CLI
+if os.getenv('K_SERVICE') is None:
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Initialize Firebase Admin
 initialize_app()
 
+
+@functools.lru_cache(maxsize=None)
+def get_db():
+    """
+    Return the Firestore client, reused across warm invocations.
+    
+    Created on first use rather than at import so deploy-time function
+    discovery doesn't need Google credentials.
+    """
+    return firestore.client()
+
 # Get Stripe keys from environment variables
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 if not STRIPE_SECRET_KEY:
     raise ValueError("STRIPE_SECRET_KEY not found in environment variables")
 
-stripe.api_key = STRIPE_SECRET_KEY
+
+@functools.lru_cache(maxsize=None)
+def get_stripe():
+    """
+    Return the stripe module configured with the secret key.
+    
+    Imported on first use so functions that never call Stripe (e.g.
+    initializeNewUserFavorites) don't pay for the import on cold start.
+    """
+    import stripe
+    stripe.api_key = STRIPE_SECRET_KEY
+    return stripe
+
+
+# Webhook signing secret, read once per instance. Optional so the callable
+# functions still deploy without it; stripeWebhook rejects events until it is set.
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+
+# Webhook events stripeWebhook acts on; others are acknowledged without touching Firestore
+HANDLED_STRIPE_EVENTS = frozenset({
+    'checkout.session.completed',
+    'customer.subscription.updated',
+    'customer.subscription.deleted',
+    'payment_intent.succeeded',
+})
+
+# How long a processed-event marker is kept. Stripe stops retrying a delivery
+# after 3 days; the TTL policy on stripe_events.expiresAt deletes older markers
+STRIPE_EVENT_MARKER_TTL = timedelta(days=7)
 
 # Set CORS options for callable functions
 cors_options = options.CorsOptions(
@@ -29,7 +72,140 @@ cors_options = options.CorsOptions(
 )
 
 
+# Stripe customer IDs already resolved on this instance, keyed by Firebase user ID
+_customer_cache: dict[str, str] = {}
+
+# Subscription fields getSubscriptionStatus copies from Stripe onto the user doc.
+# It stamps subscriptionCheckedAt when it does, and polls within the TTL are
+# answered from the doc without calling Stripe; the other writers of these
+# fields delete the stamp so the next poll goes back to Stripe
+SUBSCRIPTION_STATUS_FIELDS = ('isPremium', 'subscriptionStatus', 'cancelAtPeriodEnd', 'currentPeriodEnd')
+SUBSCRIPTION_STATUS_TTL = timedelta(seconds=60)
+
+
+def get_or_create_customer(user_id: str, email: str, stale_id: str | None = None) -> str:
+    """
+    Return the user's Stripe customer ID, creating the customer if needed.
+    
+    The stored ID is trusted without a Stripe round-trip; pass it back as
+    stale_id once Stripe has reported it missing to create a replacement.
+    The user read, creation and write-back run in one Firestore transaction
+    so concurrent calls for the same user don't create duplicate customers;
+    the idempotency key keeps transaction retries from doing so too.
+    """
+    cached = _customer_cache.get(user_id)
+    if cached and cached != stale_id:
+        return cached
+    
+    stripe = get_stripe()
+    db = get_db()
+    user_ref = db.collection('users').document(user_id)
+    
+    @firestore.transactional
+    def get_or_create(transaction) -> str:
+        snapshot = user_ref.get(transaction=transaction)
+        customer_id = (snapshot.to_dict() or {}).get('stripeCustomerId')
+        
+        if customer_id and customer_id != stale_id:
+            return customer_id
+        
+        customer = stripe.Customer.create(
+            email=email,
+            metadata={'firebaseUserId': user_id},
+            idempotency_key=f"customer-{user_id}-{customer_id or 'new'}",
+        )
+        transaction.set(user_ref, {'stripeCustomerId': customer.id}, merge=True)
+        transaction.set(db.collection('stripe_customers').document(customer.id), {'userId': user_id})
+        return customer.id
+    
+    customer_id = get_or_create(db.transaction())
+    _customer_cache[user_id] = customer_id
+    return customer_id
+
+
+def with_customer(user_id: str, email: str, create) -> tuple[str, Any]:
+    """
+    Call create(customer=...) with the user's Stripe customer ID.
+    
+    If Stripe rejects the stored customer as missing (e.g. deleted in the
+    dashboard), a new customer is created and the call retried once.
+    Returns (customer ID, create's result).
+    """
+    stripe = get_stripe()
+    customer_id = get_or_create_customer(user_id, email)
+    try:
+        return customer_id, create(customer=customer_id)
+    except stripe.InvalidRequestError as e:
+        if e.code != 'resource_missing' or e.param != 'customer':
+            raise
+    
+    customer_id = get_or_create_customer(user_id, email, stale_id=customer_id)
+    return customer_id, create(customer=customer_id)
+
+
+def find_user_ref(db, customer_id: str):
+    """
+    Return the users/ document reference for a Stripe customer, or None.
+    
+    Uses the stripe_customers/{customerId} mapping written at customer
+    creation; customers created before the mapping existed fall back to a
+    stripeCustomerId query and are backfilled so later events are point reads.
+    """
+    if not customer_id:
+        return None
+    
+    mapping_ref = db.collection('stripe_customers').document(customer_id)
+    mapping = mapping_ref.get()
+    if mapping.exists:
+        return db.collection('users').document(mapping.get('userId'))
+    
+    docs = db.collection('users').where('stripeCustomerId', '==', customer_id).limit(1).get()
+    if not docs:
+        return None
+    
+    mapping_ref.set({'userId': docs[0].id})
+    return docs[0].reference
+
+
+def stripe_callable(action: str):
+    """
+    Wrap a Stripe callable with the shared auth check and error mapping.
+    
+    Unauthenticated requests are rejected before the handler runs.
+    HttpsErrors raised by the handler pass through; Stripe errors become
+    INTERNAL "Stripe error: ..." and anything else INTERNAL
+    "Error <action>: ...".
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(req: https_fn.CallableRequest) -> dict[str, Any]:
+            if not req.auth:
+                raise https_fn.HttpsError(
+                    code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+                    message="User must be authenticated"
+                )
+            
+            stripe = get_stripe()
+            try:
+                return handler(req)
+            except https_fn.HttpsError:
+                raise
+            except stripe.StripeError as e:
+                raise https_fn.HttpsError(
+                    code=https_fn.FunctionsErrorCode.INTERNAL,
+                    message=f"Stripe error: {str(e)}"
+                )
+            except Exception as e:
+                raise https_fn.HttpsError(
+                    code=https_fn.FunctionsErrorCode.INTERNAL,
+                    message=f"Error {action}: {str(e)}"
+                )
+        return wrapper
+    return decorator
+
+
 @https_fn.on_call(cors=cors_options)
+@stripe_callable("creating checkout session")
 def createCheckoutSession(req: https_fn.CallableRequest) -> dict[str, Any]:
     """
     Create a Stripe Checkout session for web payments.
@@ -41,13 +217,6 @@ def createCheckoutSession(req: https_fn.CallableRequest) -> dict[str, Any]:
     - successUrl: URL to redirect after successful payment
     - cancelUrl: URL to redirect if user cancels
     """
-    # Verify authentication
-    if not req.auth:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
-            message="User must be authenticated"
-        )
-    
     price_id = req.data.get('priceId')
     user_id = req.data.get('userId')
     email = req.data.get('email')
@@ -60,65 +229,31 @@ def createCheckoutSession(req: https_fn.CallableRequest) -> dict[str, Any]:
             message="Missing required fields"
         )
     
-    try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        user_data = user_doc.to_dict() if user_doc.exists else {}
-        
-        # Get or create Stripe customer
-        customer_id = user_data.get('stripeCustomerId')
-        
-        if customer_id:
-            try:
-                customer = stripe.Customer.retrieve(customer_id)
-            except stripe.StripeError:
-                customer = None
-        else:
-            customer = None
-            
-        if not customer:
-            customer = stripe.Customer.create(
-                email=email,
-                metadata={'firebaseUserId': user_id}
-            )
-            user_ref.set({
-                'stripeCustomerId': customer.id
-            }, merge=True)
-        
-        # Create Stripe Checkout Session
-        checkout_session = stripe.checkout.Session.create(
-            customer=customer.id,
-            line_items=[{
-                'price': price_id,
-                'quantity': 1,
-            }],
-            mode='subscription',
-            success_url=success_url + '?session_id={CHECKOUT_SESSION_ID}',
-            cancel_url=cancel_url,
-            metadata={
-                'userId': user_id,
-            },
-        )
-        
-        return {
-            'url': checkout_session.url,
-            'sessionId': checkout_session.id
-        }
-        
-    except stripe.StripeError as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Stripe error: {str(e)}"
-        )
-    except Exception as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Error creating checkout session: {str(e)}"
-        )
+    stripe = get_stripe()
+    
+    # Create Stripe Checkout Session for the user's (possibly new) customer
+    _, checkout_session = with_customer(user_id, email, functools.partial(
+        stripe.checkout.Session.create,
+        line_items=[{
+            'price': price_id,
+            'quantity': 1,
+        }],
+        mode='subscription',
+        success_url=success_url + '?session_id={CHECKOUT_SESSION_ID}',
+        cancel_url=cancel_url,
+        metadata={
+            'userId': user_id,
+        },
+    ))
+    
+    return {
+        'url': checkout_session.url,
+        'sessionId': checkout_session.id
+    }
 
 
 @https_fn.on_call(cors=cors_options)
+@stripe_callable("creating subscription")
 def createSubscription(req: https_fn.CallableRequest) -> dict[str, Any]:
     """
     Create a Stripe subscription for a user.
@@ -128,13 +263,6 @@ def createSubscription(req: https_fn.CallableRequest) -> dict[str, Any]:
     - userId: Firebase User ID
     - email: User email
     """
-    # Verify authentication
-    if not req.auth:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
-            message="User must be authenticated"
-        )
-    
     price_id = req.data.get('priceId')
     user_id = req.data.get('userId')
     email = req.data.get('email')
@@ -145,71 +273,40 @@ def createSubscription(req: https_fn.CallableRequest) -> dict[str, Any]:
             message="Missing required fields: priceId, userId, email"
         )
     
-    try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        user_data = user_doc.to_dict() if user_doc.exists else {}
-        
-        # Get or create Stripe customer
-        customer_id = user_data.get('stripeCustomerId')
-        
-        if customer_id:
-            try:
-                customer = stripe.Customer.retrieve(customer_id)
-            except stripe.StripeError:
-                customer = None
-        else:
-            customer = None
-            
-        if not customer:
-            customer = stripe.Customer.create(
-                email=email,
-                metadata={'firebaseUserId': user_id}
-            )
-            user_ref.set({
-                'stripeCustomerId': customer.id
-            }, merge=True)
-        
-        # Create subscription
-        subscription = stripe.Subscription.create(
-            customer=customer.id,
-            items=[{'price': price_id}],
-            payment_behavior='default_incomplete',
-            payment_settings={'save_default_payment_method': 'on_subscription'},
-            expand=['latest_invoice.payment_intent']
-        )
-        
-        # Update user premium status
-        user_ref.set({
-            'isPremium': True,
-            'subscriptionId': subscription.id,
-            'subscriptionStatus': subscription.status
-        }, merge=True)
-        
-        # Get payment intent client secret
-        invoice = subscription.latest_invoice
-        payment_intent = invoice['payment_intent']
-        
-        return {
-            'clientSecret': payment_intent['client_secret'],
-            'customerId': customer.id,
-            'subscriptionId': subscription.id
-        }
-        
-    except stripe.StripeError as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Stripe error: {str(e)}"
-        )
-    except Exception as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Error creating subscription: {str(e)}"
-        )
+    stripe = get_stripe()
+    db = get_db()
+    user_ref = db.collection('users').document(user_id)
+    
+    # Create subscription for the user's (possibly new) customer
+    customer_id, subscription = with_customer(user_id, email, functools.partial(
+        stripe.Subscription.create,
+        items=[{'price': price_id}],
+        payment_behavior='default_incomplete',
+        payment_settings={'save_default_payment_method': 'on_subscription'},
+        expand=['latest_invoice.payment_intent']
+    ))
+    
+    # Update user premium status
+    user_ref.set({
+        'isPremium': True,
+        'subscriptionId': subscription.id,
+        'subscriptionStatus': subscription.status,
+        'subscriptionCheckedAt': firestore.DELETE_FIELD
+    }, merge=True)
+    
+    # Get payment intent client secret
+    invoice = subscription.latest_invoice
+    payment_intent = invoice['payment_intent']
+    
+    return {
+        'clientSecret': payment_intent['client_secret'],
+        'customerId': customer_id,
+        'subscriptionId': subscription.id
+    }
 
 
 @https_fn.on_call(cors=cors_options)
+@stripe_callable("creating payment intent")
 def createPaymentIntent(req: https_fn.CallableRequest) -> dict[str, Any]:
     """
     Create a one-time payment intent for lifetime premium.
@@ -220,12 +317,6 @@ def createPaymentIntent(req: https_fn.CallableRequest) -> dict[str, Any]:
     - userId: Firebase User ID
     - email: User email
     """
-    if not req.auth:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
-            message="User must be authenticated"
-        )
-    
     amount = req.data.get('amount')
     currency = req.data.get('currency', 'usd')
     user_id = req.data.get('userId')
@@ -237,62 +328,28 @@ def createPaymentIntent(req: https_fn.CallableRequest) -> dict[str, Any]:
             message="Missing required fields: amount, userId, email"
         )
     
-    try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        user_data = user_doc.to_dict() if user_doc.exists else {}
-        
-        # Get or create Stripe customer
-        customer_id = user_data.get('stripeCustomerId')
-        
-        if customer_id:
-            try:
-                customer = stripe.Customer.retrieve(customer_id)
-            except stripe.StripeError:
-                customer = None
-        else:
-            customer = None
-            
-        if not customer:
-            customer = stripe.Customer.create(
-                email=email,
-                metadata={'firebaseUserId': user_id}
-            )
-            user_ref.set({
-                'stripeCustomerId': customer.id
-            }, merge=True)
-        
-        # Create payment intent
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount,
-            currency=currency,
-            customer=customer.id,
-            metadata={
-                'userId': user_id,
-                'type': 'lifetime_premium'
-            },
-            automatic_payment_methods={'enabled': True}
-        )
-        
-        return {
-            'clientSecret': payment_intent.client_secret,
-            'customerId': customer.id
-        }
-        
-    except stripe.StripeError as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Stripe error: {str(e)}"
-        )
-    except Exception as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Error creating payment intent: {str(e)}"
-        )
+    stripe = get_stripe()
+    
+    # Create payment intent for the user's (possibly new) customer
+    customer_id, payment_intent = with_customer(user_id, email, functools.partial(
+        stripe.PaymentIntent.create,
+        amount=amount,
+        currency=currency,
+        metadata={
+            'userId': user_id,
+            'type': 'lifetime_premium'
+        },
+        automatic_payment_methods={'enabled': True}
+    ))
+    
+    return {
+        'clientSecret': payment_intent.client_secret,
+        'customerId': customer_id
+    }
 
 
 @https_fn.on_call(cors=cors_options)
+@stripe_callable("cancelling subscription")
 def cancelSubscription(req: https_fn.CallableRequest) -> dict[str, Any]:
     """
     Cancel a user's subscription.
@@ -300,12 +357,6 @@ def cancelSubscription(req: https_fn.CallableRequest) -> dict[str, Any]:
     Expected data:
     - userId: Firebase User ID
     """
-    if not req.auth:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
-            message="User must be authenticated"
-        )
-    
     user_id = req.data.get('userId')
     
     if not user_id:
@@ -314,58 +365,49 @@ def cancelSubscription(req: https_fn.CallableRequest) -> dict[str, Any]:
             message="Missing required field: userId"
         )
     
-    try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            raise https_fn.HttpsError(
-                code=https_fn.FunctionsErrorCode.NOT_FOUND,
-                message="User not found"
-            )
-        
-        user_data = user_doc.to_dict()
-        subscription_id = user_data.get('subscriptionId')
-        
-        if not subscription_id:
-            raise https_fn.HttpsError(
-                code=https_fn.FunctionsErrorCode.NOT_FOUND,
-                message="No active subscription found"
-            )
-        
-        # Cancel subscription at period end
-        subscription = stripe.Subscription.modify(
-            subscription_id,
-            cancel_at_period_end=True
-        )
-        
-        # Update user status
-        user_ref.set({
-            'subscriptionStatus': subscription.status,
-            'cancelAtPeriodEnd': subscription.cancel_at_period_end,
-            'currentPeriodEnd': subscription.current_period_end
-        }, merge=True)
-        
-        return {
-            'success': True,
-            'message': 'Subscription will be cancelled at period end',
-            'currentPeriodEnd': subscription.current_period_end
-        }
-        
-    except stripe.StripeError as e:
+    stripe = get_stripe()
+    db = get_db()
+    user_ref = db.collection('users').document(user_id)
+    user_doc = user_ref.get()
+    
+    if not user_doc.exists:
         raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Stripe error: {str(e)}"
+            code=https_fn.FunctionsErrorCode.NOT_FOUND,
+            message="User not found"
         )
-    except Exception as e:
+    
+    user_data = user_doc.to_dict()
+    subscription_id = user_data.get('subscriptionId')
+    
+    if not subscription_id:
         raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Error cancelling subscription: {str(e)}"
+            code=https_fn.FunctionsErrorCode.NOT_FOUND,
+            message="No active subscription found"
         )
+    
+    # Cancel subscription at period end
+    subscription = stripe.Subscription.modify(
+        subscription_id,
+        cancel_at_period_end=True
+    )
+    
+    # Update user status
+    user_ref.set({
+        'subscriptionStatus': subscription.status,
+        'cancelAtPeriodEnd': subscription.cancel_at_period_end,
+        'currentPeriodEnd': subscription.current_period_end,
+        'subscriptionCheckedAt': firestore.DELETE_FIELD
+    }, merge=True)
+    
+    return {
+        'success': True,
+        'message': 'Subscription will be cancelled at period end',
+        'currentPeriodEnd': subscription.current_period_end
+    }
 
 
 @https_fn.on_call(cors=cors_options)
+@stripe_callable("getting subscription status")
 def getSubscriptionStatus(req: https_fn.CallableRequest) -> dict[str, Any]:
     """
     Get user's subscription status.
@@ -373,12 +415,6 @@ def getSubscriptionStatus(req: https_fn.CallableRequest) -> dict[str, Any]:
     Expected data:
     - userId: Firebase User ID
     """
-    if not req.auth:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
-            message="User must be authenticated"
-        )
-    
     user_id = req.data.get('userId')
     
     if not user_id:
@@ -387,51 +423,45 @@ def getSubscriptionStatus(req: https_fn.CallableRequest) -> dict[str, Any]:
             message="Missing required field: userId"
         )
     
-    try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            return {
-                'isPremium': False,
-                'subscriptionStatus': None
-            }
-        
-        user_data = user_doc.to_dict()
-        subscription_id = user_data.get('subscriptionId')
-        
-        if subscription_id:
-            try:
-                subscription = stripe.Subscription.retrieve(subscription_id)
-                
-                # Update Firestore with latest status
-                user_ref.set({
-                    'subscriptionStatus': subscription.status,
-                    'isPremium': subscription.status in ['active', 'trialing'],
-                    'cancelAtPeriodEnd': subscription.cancel_at_period_end,
-                    'currentPeriodEnd': subscription.current_period_end
-                }, merge=True)
-                
-                return {
-                    'isPremium': subscription.status in ['active', 'trialing'],
-                    'subscriptionStatus': subscription.status,
-                    'cancelAtPeriodEnd': subscription.cancel_at_period_end,
-                    'currentPeriodEnd': subscription.current_period_end
-                }
-            except stripe.StripeError:
-                pass
-        
+    stripe = get_stripe()
+    db = get_db()
+    user_ref = db.collection('users').document(user_id)
+    user_doc = user_ref.get()
+    
+    if not user_doc.exists:
         return {
-            'isPremium': user_data.get('isPremium', False),
-            'subscriptionStatus': user_data.get('subscriptionStatus')
+            'isPremium': False,
+            'subscriptionStatus': None
         }
-        
-    except Exception as e:
-        raise https_fn.HttpsError(
-            code=https_fn.FunctionsErrorCode.INTERNAL,
-            message=f"Error getting subscription status: {str(e)}"
-        )
+    
+    user_data = user_doc.to_dict()
+    subscription_id = user_data.get('subscriptionId')
+    
+    # Checked against Stripe recently and not changed since; answer from the doc
+    checked_at = user_data.get('subscriptionCheckedAt')
+    if subscription_id and checked_at and datetime.now(timezone.utc) - checked_at < SUBSCRIPTION_STATUS_TTL:
+        return {field: user_data.get(field) for field in SUBSCRIPTION_STATUS_FIELDS}
+    
+    if subscription_id:
+        try:
+            subscription = stripe.Subscription.retrieve(subscription_id)
+            status = {
+                'isPremium': subscription.status in ['active', 'trialing'],
+                'subscriptionStatus': subscription.status,
+                'cancelAtPeriodEnd': subscription.cancel_at_period_end,
+                'currentPeriodEnd': subscription.current_period_end
+            }
+            
+            # Store Stripe's answer and when it was fetched for the polls that follow
+            user_ref.set({**status, 'subscriptionCheckedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+            return status
+        except stripe.StripeError:
+            pass
+    
+    return {
+        'isPremium': user_data.get('isPremium', False),
+        'subscriptionStatus': user_data.get('subscriptionStatus')
+    }
 
 
 @https_fn.on_request(cors=options.CorsOptions(cors_origins="*", cors_methods=["post"]))
@@ -449,18 +479,18 @@ def stripeWebhook(req: https_fn.Request) -> https_fn.Response:
     payload = req.get_data()
     sig_header = req.headers.get('Stripe-Signature')
     
-    # Get webhook secret from environment variables
-    webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
-    if not webhook_secret:
+    if not STRIPE_WEBHOOK_SECRET:
         return https_fn.Response("Webhook secret not configured", status=500)
     
     # If no signature header, we can't verify (might be a test)
     if not sig_header:
         return https_fn.Response("No Stripe signature found", status=400)
     
+    stripe = get_stripe()
+    
     try:
         event = stripe.Webhook.construct_event(
-            payload, sig_header, webhook_secret
+            payload, sig_header, STRIPE_WEBHOOK_SECRET
         )
     except ValueError as e:
         return https_fn.Response(f"Invalid payload: {str(e)}", status=400)
@@ -472,7 +502,18 @@ def stripeWebhook(req: https_fn.Request) -> https_fn.Response:
     event_type = event['type']
     data = event['data']['object']
     
-    db = firestore.client()
+    if event_type not in HANDLED_STRIPE_EVENTS:
+        return https_fn.Response("Ignored", status=200)
+    
+    db = get_db()
+    
+    # Stripe retries deliveries until it sees a 2xx; skip events already applied
+    event_ref = db.collection('stripe_events').document(event['id'])
+    if event_ref.get().exists:
+        return https_fn.Response("Already processed", status=200)
+    
+    # The event's updates and its processed marker commit together in one batch
+    batch = db.batch()
     
     try:
         if event_type == 'checkout.session.completed':
@@ -484,12 +525,15 @@ def stripeWebhook(req: https_fn.Request) -> https_fn.Response:
             
             if user_id and subscription_id:
                 user_ref = db.collection('users').document(user_id)
-                user_ref.set({
+                batch.set(user_ref, {
                     'stripeCustomerId': customer_id,
                     'subscriptionId': subscription_id,
                     'subscriptionStatus': 'active',
-                    'isPremium': True
+                    'isPremium': True,
+                    'subscriptionCheckedAt': firestore.DELETE_FIELD
                 }, merge=True)
+                if customer_id:
+                    batch.set(db.collection('stripe_customers').document(customer_id), {'userId': user_id})
         
         elif event_type == 'customer.subscription.updated':
             # Update subscription status
@@ -497,22 +541,24 @@ def stripeWebhook(req: https_fn.Request) -> https_fn.Response:
             subscription_status = data.get('status')
             
             # Find user by customer ID
-            users = db.collection('users').where('stripeCustomerId', '==', customer_id).limit(1).stream()
-            for user in users:
-                user.reference.set({
+            user_ref = find_user_ref(db, customer_id)
+            if user_ref:
+                batch.set(user_ref, {
                     'subscriptionStatus': subscription_status,
-                    'isPremium': subscription_status in ['active', 'trialing']
+                    'isPremium': subscription_status in ['active', 'trialing'],
+                    'subscriptionCheckedAt': firestore.DELETE_FIELD
                 }, merge=True)
         
         elif event_type == 'customer.subscription.deleted':
             # Subscription cancelled
             customer_id = data.get('customer')
             
-            users = db.collection('users').where('stripeCustomerId', '==', customer_id).limit(1).stream()
-            for user in users:
-                user.reference.set({
+            user_ref = find_user_ref(db, customer_id)
+            if user_ref:
+                batch.set(user_ref, {
                     'isPremium': False,
-                    'subscriptionStatus': 'cancelled'
+                    'subscriptionStatus': 'cancelled',
+                    'subscriptionCheckedAt': firestore.DELETE_FIELD
                 }, merge=True)
         
         elif event_type == 'payment_intent.succeeded':
@@ -523,13 +569,22 @@ def stripeWebhook(req: https_fn.Request) -> https_fn.Response:
             
             if user_id and payment_type == 'lifetime_premium':
                 user_ref = db.collection('users').document(user_id)
-                user_ref.set({
+                batch.set(user_ref, {
                     'isPremium': True,
                     'subscriptionType': 'lifetime'
                 }, merge=True)
         
+        batch.create(event_ref, {
+            'type': event_type,
+            'processedAt': firestore.SERVER_TIMESTAMP,
+            'expiresAt': datetime.now(timezone.utc) + STRIPE_EVENT_MARKER_TTL
+        })
+        batch.commit()
         return https_fn.Response("Success", status=200)
         
+    except AlreadyExists:
+        # A concurrent delivery of the same event committed first
+        return https_fn.Response("Already processed", status=200)
     except Exception as e:
         print(f"Error handling webhook: {str(e)}")
         return https_fn.Response(f"Error: {str(e)}", status=500)
@@ -555,7 +610,7 @@ def initializeNewUserFavorites(req: https_fn.CallableRequest) -> dict[str, Any]:
     user_id = req.auth.uid
     
     try:
-        db = firestore.client()
+        db = get_db()
         
         # Check if user already has favorites
         favorites_ref = db.collection('user_favorites').document(user_id)
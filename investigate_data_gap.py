@@ -4,31 +4,45 @@ Investigate the real-time data gap issue.
 Check what's actually available in the real-time API as of October 16, 2025.
 """
 
-import requests
-from datetime import datetime, timedelta
+import functools
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import StringIO
 
-def investigate_realtime_gap():
+# Shared helpers live in admin_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'admin_scripts'))
+import http_cache
+from probe_common import SESSION, fast_json
+
+# Reuse windows in seconds: realtime data updates hourly-ish, station metadata rarely
+REALTIME_MAX_AGE = 15 * 60
+STATION_MAX_AGE = 24 * 3600
+
+def investigate_realtime_gap(out=None):
     """Check what real-time data is actually available"""
+    log = functools.partial(print, file=out)
     station = "08NA011"
     
-    print("🔍 Investigating Real-time Data Gap Issue")
-    print(f"📅 Current Date: October 16, 2025")
-    print("=" * 60)
+    log("🔍 Investigating Real-time Data Gap Issue")
+    log(f"📅 Current Date: October 16, 2025")
+    log("=" * 60)
     
     # Check what's available in real-time API
     url = f"https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station}&limit=10&sortby=-DATETIME&f=json"
     
-    print("📡 Checking most recent real-time data...")
-    print(f"URL: {url}")
+    log("📡 Checking most recent real-time data...")
+    log(f"URL: {url}")
     
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
+        status, body = http_cache.conditional_get(SESSION, url, max_age=REALTIME_MAX_AGE, timeout=10)
+        if status == 200:
+            data = fast_json.loads(body)
             features = data.get('features', [])
             
             if features:
-                print(f"✅ Real-time API returned {len(features)} records")
+                log(f"✅ Real-time API returned {len(features)} records")
                 
                 # Check the most recent record
                 latest = features[0]['properties']
@@ -36,56 +50,52 @@ def investigate_realtime_gap():
                 latest_discharge = latest['DISCHARGE']
                 latest_level = latest['LEVEL']
                 
-                print(f"\n📊 Most Recent Real-time Record:")
-                print(f"   DateTime: {latest_datetime}")
-                print(f"   Discharge: {latest_discharge} m³/s")
-                print(f"   Level: {latest_level} m")
+                log(f"\n📊 Most Recent Real-time Record:")
+                log(f"   DateTime: {latest_datetime}")
+                log(f"   Discharge: {latest_discharge} m³/s")
+                log(f"   Level: {latest_level} m")
                 
                 # Parse the datetime to see how old it is
                 latest_dt = datetime.fromisoformat(latest_datetime.replace('Z', '+00:00'))
-                current_dt = datetime(2025, 10, 16, 12, 0, 0)  # Assume noon on Oct 16
+                current_dt = datetime(2025, 10, 16, 12, 0, 0, tzinfo=timezone.utc)  # Assume noon on Oct 16
                 
                 age_hours = (current_dt - latest_dt).total_seconds() / 3600
                 age_days = age_hours / 24
                 
-                print(f"\n⏰ Data Age:")
-                print(f"   {age_hours:.1f} hours old")
-                print(f"   {age_days:.1f} days old")
+                log(f"\n⏰ Data Age:")
+                log(f"   {age_hours:.1f} hours old")
+                log(f"   {age_days:.1f} days old")
                 
                 if age_days > 1:
-                    print(f"   ⚠️  Data is significantly outdated!")
+                    log(f"   ⚠️  Data is significantly outdated!")
                 else:
-                    print(f"   ✅ Data is reasonably current")
+                    log(f"   ✅ Data is reasonably current")
                 
                 # Check the full date range available
-                print(f"\n📅 Checking full real-time data range...")
+                log(f"\n📅 Checking full real-time data range...")
                 
                 oldest = features[-1]['properties']
                 oldest_datetime = oldest['DATETIME']
                 
-                print(f"   Oldest record: {oldest_datetime}")
-                print(f"   Latest record: {latest_datetime}")
+                log(f"   Oldest record: {oldest_datetime}")
+                log(f"   Latest record: {latest_datetime}")
                 
-                # Get total count
-                count_url = f"https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station}&limit=10000&f=json"
-                count_response = requests.get(count_url, timeout=30)
+                # The latest record came back above (sorted newest first); ask the server for the
+                # oldest one instead of downloading the whole series. numberMatched gives the count.
+                earliest_url = f"https://api.weather.gc.ca/collections/hydrometric-realtime/items?STATION_NUMBER={station}&limit=1&sortby=DATETIME&properties=DATETIME&skipGeometry=true&f=json"
+                earliest_status, earliest_body = http_cache.conditional_get(SESSION, earliest_url, max_age=REALTIME_MAX_AGE, timeout=10)
                 
-                if count_response.status_code == 200:
-                    count_data = count_response.json()
-                    count_features = count_data.get('features', [])
+                if earliest_status == 200:
+                    earliest_features = fast_json.loads(earliest_body).get('features', [])
                     
-                    if count_features:
-                        print(f"\n📈 Full Real-time Dataset:")
-                        print(f"   Total records: {len(count_features)}")
-                        
-                        # Get actual date range
-                        all_dates = [f['properties']['DATETIME'] for f in count_features]
-                        all_dates.sort()
+                    if earliest_features:
+                        log(f"\n📈 Full Real-time Dataset:")
+                        log(f"   Total records: {data.get('numberMatched', 'unknown')}")
                         
-                        earliest = all_dates[0]
-                        latest_full = all_dates[-1]
+                        earliest = earliest_features[0]['properties']['DATETIME']
+                        latest_full = latest_datetime
                         
-                        print(f"   Full range: {earliest} to {latest_full}")
+                        log(f"   Full range: {earliest} to {latest_full}")
                         
                         # Calculate coverage
                         earliest_dt = datetime.fromisoformat(earliest.replace('Z', '+00:00'))
@@ -94,66 +104,67 @@ def investigate_realtime_gap():
                         coverage_days = (latest_full_dt - earliest_dt).days
                         gap_to_today = (current_dt - latest_full_dt).days
                         
-                        print(f"   Coverage period: {coverage_days} days")
-                        print(f"   Gap to today: {gap_to_today} days")
+                        log(f"   Coverage period: {coverage_days} days")
+                        log(f"   Gap to today: {gap_to_today} days")
                         
                         if gap_to_today > 0:
-                            print(f"\n❌ ISSUE IDENTIFIED:")
-                            print(f"   Real-time data stops on {latest_full[:10]}")
-                            print(f"   Missing {gap_to_today} days of recent data")
-                            print(f"   This explains why charts show Sept 19th as most recent")
+                            log(f"\n❌ ISSUE IDENTIFIED:")
+                            log(f"   Real-time data stops on {latest_full[:10]}")
+                            log(f"   Missing {gap_to_today} days of recent data")
+                            log(f"   This explains why charts show Sept 19th as most recent")
                         else:
-                            print(f"\n✅ Real-time data appears current")
+                            log(f"\n✅ Real-time data appears current")
                 
             else:
-                print("❌ No real-time data found")
+                log("❌ No real-time data found")
                 
         else:
-            print(f"❌ HTTP Error: {response.status_code}")
-            print(f"Response: {response.text[:200]}")
+            log(f"❌ HTTP Error: {status}")
+            log(f"Response: {body[:200].decode('utf-8', errors='replace')}")
             
     except Exception as e:
-        print(f"❌ Error: {e}")
+        log(f"❌ Error: {e}")
 
-def check_station_status():
+def check_station_status(out=None):
     """Check if the station is active or if there are known issues"""
+    log = functools.partial(print, file=out)
     station = "08NA011"
     
-    print(f"\n\n🏛️ Checking Station Status")
-    print("=" * 60)
+    log(f"\n\n🏛️ Checking Station Status")
+    log("=" * 60)
     
     # Check station metadata
     station_url = f"https://api.weather.gc.ca/collections/hydrometric-stations/items?STATION_NUMBER={station}&f=json"
     
     try:
-        response = requests.get(station_url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
+        status, body = http_cache.conditional_get(SESSION, station_url, max_age=STATION_MAX_AGE, timeout=10)
+        if status == 200:
+            data = fast_json.loads(body)
             features = data.get('features', [])
             
             if features:
                 station_info = features[0]['properties']
-                print(f"📍 Station: {station_info.get('STATION_NAME', 'Unknown')}")
-                print(f"🏛️ Status: {station_info.get('STATUS', 'Unknown')}")
-                print(f"📅 First Year: {station_info.get('FIRST_YEAR', 'Unknown')}")
-                print(f"📅 Last Year: {station_info.get('LAST_YEAR', 'Unknown')}")
+                log(f"📍 Station: {station_info.get('STATION_NAME', 'Unknown')}")
+                log(f"🏛️ Status: {station_info.get('STATUS', 'Unknown')}")
+                log(f"📅 First Year: {station_info.get('FIRST_YEAR', 'Unknown')}")
+                log(f"📅 Last Year: {station_info.get('LAST_YEAR', 'Unknown')}")
                 
                 # Check if station is marked as inactive
                 status = station_info.get('STATUS', '').upper()
                 last_year = station_info.get('LAST_YEAR')
                 
                 if 'INACTIVE' in status or (last_year and int(last_year) < 2025):
-                    print(f"⚠️  Station appears to be inactive or discontinued")
+                    log(f"⚠️  Station appears to be inactive or discontinued")
                 else:
-                    print(f"✅ Station appears to be active")
+                    log(f"✅ Station appears to be active")
                     
             else:
-                print("❌ Station not found in metadata")
+                log("❌ Station not found in metadata")
         else:
-            print(f"❌ Station metadata error: {response.status_code}")
+            log(f"❌ Station metadata error: {status}")
             
     except Exception as e:
-        print(f"❌ Station check error: {e}")
+        log(f"❌ Station check error: {e}")
 
 def suggest_solutions():
     """Suggest solutions for the data gap issue"""
@@ -184,8 +195,17 @@ def suggest_solutions():
     print("   • May resume data collection in spring")
 
 def main():
-    investigate_realtime_gap()
-    check_station_status()
+    # The two checks hit the API independently; run them concurrently over the shared
+    # session and print each buffered report in order
+    def run(check):
+        out = StringIO()
+        check(out)
+        return out.getvalue()
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for report in executor.map(run, [investigate_realtime_gap, check_station_status]):
+            print(report, end='')
+    
     suggest_solutions()
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Backfill the name_tokens search field on river_runs.
+
+name_tokens holds the distinct lowercase words of a run's name, river and
+location, so finder scripts can use an array_contains query (served by
+Firestore's automatic single-field index) instead of scanning every run.
+upload_to_firestore.py and seed_emulator.py set it on the runs they write;
+rerun this after runs are added or renamed elsewhere (e.g. from the app).
+
+Usage:
+    # Dry run (no writes)
+    python3 add_name_tokens.py --dry-run
+
+    # Write tokens for runs that are missing or out of date
+    python3 add_name_tokens.py
+"""
+
+import argparse
+import os
+import re
+import sys
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    print("❌ Error: firebase-admin not installed")
+    print("Install with: pip install firebase-admin")
+    sys.exit(1)
+
+# Fields whose words are indexed in name_tokens
+TOKEN_FIELDS = ('name', 'river', 'location')
+
+# Firestore limit: 500 operations per batch
+BATCH_SIZE = 500
+
+def name_tokens(data):
+    """Return the sorted distinct lowercase words of a run's name, river and location."""
+    text = ' '.join(data.get(field) or '' for field in TOKEN_FIELDS)
+    return sorted(set(re.findall(r'[a-z0-9]+', text.lower())))
+
+def init_firebase():
+    """Initialize Firebase Admin SDK."""
+    if not firebase_admin._apps:
+        cred_path = 'admin_scripts/service_account_key.json'
+        if not os.path.exists(cred_path):
+            print(f"❌ Credentials not found at {cred_path}")
+            sys.exit(1)
+        cred = credentials.Certificate(cred_path)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill name_tokens on river_runs')
+    parser.add_argument('--dry-run', action='store_true', help='Preview without writing')
+    args = parser.parse_args()
+
+    print(f"🔤 {'[DRY RUN] ' if args.dry_run else ''}Adding name_tokens to river_runs...")
+    print("=" * 60)
+
+    db = init_firebase()
+    runs_ref = db.collection('river_runs').select(list(TOKEN_FIELDS) + ['name_tokens'])
+
+    batch = db.batch()
+    batch_count = 0
+    updated = 0
+    unchanged = 0
+
+    for doc in runs_ref.stream():
+        data = doc.to_dict()
+        tokens = name_tokens(data)
+
+        if data.get('name_tokens') == tokens:
+            unchanged += 1
+            continue
+
+        updated += 1
+        if args.dry_run:
+            print(f"  📝 {doc.id}: {tokens}")
+            continue
+
+        batch.update(doc.reference, {'name_tokens': tokens})
+        batch_count += 1
+
+        if batch_count >= BATCH_SIZE:
+            batch.commit()
+            print(f"  ✅ Committed batch of {batch_count} updates")
+            batch = db.batch()
+            batch_count = 0
+
+    if batch_count > 0:
+        batch.commit()
+        print(f"  ✅ Committed final batch of {batch_count} updates")
+
+    print(f"\n📊 {'Would update' if args.dry_run else 'Updated'}: {updated}")
+    print(f"⏭️  Already up to date: {unchanged}")
+
+if __name__ == '__main__':
+    main()
@@ -35,19 +35,26 @@ def main():
     
     # Get all water_stations
     print("\n1. Fetching water_stations collection...")
-    stations_ref = db.collection('water_stations')
-    stations = {doc.id: doc.to_dict() for doc in stations_ref.stream()}
-    print(f"   Found {len(stations)} water stations")
+    stations_ref = db.collection('water_stations').select(['stationName'])
+    station_names = {
+        doc.id: doc.to_dict().get('stationName', 'Unknown')
+        for doc in stations_ref.stream()
+    }
+    print(f"   Found {len(station_names)} water stations")
     
-    if len(stations) > 0:
+    if len(station_names) > 0:
         print("\n   Sample station IDs:")
-        for i, station_id in enumerate(list(stations.keys())[:5]):
-            station = stations[station_id]
-            print(f"     - {station_id}: {station.get('stationName', 'Unknown')}")
+        for station_id, station_name in list(station_names.items())[:5]:
+            print(f"     - {station_id}: {station_name}")
     
     # Get river_runs with stationId
     print("\n2. Fetching river_runs with stationId...")
-    runs_ref = db.collection('river_runs')
+    # Only fetch runs that have a stationId, and only the fields used below
+    runs_ref = (
+        db.collection('river_runs')
+        .where('stationId', '!=', None)
+        .select(['name', 'stationId', 'riverId'])
+    )
     runs_with_stations = []
     
     for doc in runs_ref.stream():
@@ -71,12 +78,12 @@ def main():
     
     for run in runs_with_stations:
         station_id = run['stationId']
-        if station_id in stations:
+        station_name = station_names.get(station_id)
+        if station_name is not None:
             matches.append(run)
-            station = stations[station_id]
             print(f"✅ {run['name']}")
             print(f"   Run ID: {run['id']}")
-            print(f"   Station: {station_id} - {station.get('stationName', 'Unknown')}")
+            print(f"   Station: {station_id} - {station_name}")
             print()
         else:
             mismatches.append(run)
@@ -89,7 +96,7 @@ def main():
     print("=" * 60)
     print("SUMMARY")
     print("=" * 60)
-    print(f"Water stations in database: {len(stations)}")
+    print(f"Water stations in database: {len(station_names)}")
     print(f"Runs with stationId: {len(runs_with_stations)}")
     print(f"✅ Matching links: {len(matches)}")
     print(f"❌ Missing stations: {len(mismatches)}")
@@ -15,6 +15,9 @@ except ImportError:
     print("Install with: pip install firebase-admin")
     sys.exit(1)
 
+# Attempts per gauge_station write before BulkWriter gives up on it
+MAX_WRITE_ATTEMPTS = 10
+
 def init_firebase():
     """Initialize Firebase."""
     if not firebase_admin._apps:
@@ -34,7 +37,11 @@ def main():
     
     # Get all river_runs with stationId
     print("\n1. Fetching river_runs with stationId...")
-    runs_ref = db.collection('river_runs')
+    runs_ref = (
+        db.collection('river_runs')
+        .where('stationId', '!=', None)
+        .select(['name', 'riverId', 'stationId'])
+    )
     runs_with_stations = []
     
     for doc in runs_ref.stream():
@@ -64,7 +71,7 @@ def main():
     
     # Check which stations already have gauge_stations
     existing_gauge_stations = set()
-    for doc in db.collection('gauge_stations').stream():
+    for doc in db.collection('gauge_stations').select(['stationId']).stream():
         data = doc.to_dict()
         if data.get('stationId'):
             existing_gauge_stations.add(data['stationId'])
@@ -76,17 +83,41 @@ def main():
     created = 0
     skipped = 0
     errors = 0
+    failed_writes = 0
+    
+    # Fetch all needed water_stations in one batched read instead of one RPC per station
+    station_refs = [
+        db.collection('water_stations').document(station_id)
+        for station_id in runs_by_station
+        if station_id not in existing_gauge_stations
+    ]
+    station_docs = {doc.id: doc for doc in db.get_all(station_refs)} if station_refs else {}
+    
+    # Queue the gauge_station writes; BulkWriter sends them in parallel batches with retries.
+    # close() doesn't raise on failed writes, so outcomes are collected from its callbacks
+    bulk_writer = db.bulk_writer()
+    queued = {}
+    written = set()
+    write_failures = {}
+    
+    def on_write_error(error, writer):
+        if error.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        write_failures[error.operation.reference.path] = error.message
+        return False
+    
+    bulk_writer.on_write_result(lambda reference, result, writer: written.add(reference.path))
+    bulk_writer.on_write_error(on_write_error)
     
     for station_id, runs in runs_by_station.items():
         # Skip if gauge_station already exists
         if station_id in existing_gauge_stations:
-            run_names = [r['name'] for r in runs]
             print(f"  ⏭️  Station {station_id}: gauge_station already exists ({len(runs)} runs)")
             skipped += len(runs)
             continue
         
-        # Fetch water_station data
-        station_doc = db.collection('water_stations').document(station_id).get()
+        # Look up the prefetched water_station data
+        station_doc = station_docs[station_id]
         
         if not station_doc.exists:
             print(f"  ⚠️  Station {station_id}: water_station not found")
@@ -123,9 +154,20 @@ def main():
         }
         
         # Add to gauge_stations collection
-        db.collection('gauge_stations').add(gauge_station_data)
+        gauge_station_ref = db.collection('gauge_stations').document()
+        bulk_writer.create(gauge_station_ref, gauge_station_data)
+        queued[gauge_station_ref.path] = (station_id, runs, lat, lon)
+    
+    # Flush the queued writes, then report each one from its confirmed outcome
+    bulk_writer.close()
+    
+    for path, (station_id, runs, lat, lon) in queued.items():
+        if path not in written:
+            print(f"  ❌ Station {station_id}: write failed: {write_failures.get(path, 'no result reported')}")
+            failed_writes += 1
+            continue
         
-        run_names = ', '.join([r['name'] for r in runs])
+        run_names = ', '.join(r['name'] for r in runs)
         print(f"  ✅ Station {station_id}: Created gauge_station for {len(runs)} runs")
         print(f"     Runs: {run_names}")
         print(f"     GPS: ({lat}, {lon})")
@@ -140,6 +182,7 @@ def main():
     print(f"✅ Gauge stations created: {created}")
     print(f"⏭️  Skipped (already exist): {skipped} runs")
     print(f"⚠️  Errors (station not found or no coords): {errors} runs")
+    print(f"❌ Failed writes: {failed_writes} stations")
     
     if created > 0:
         print("\n✅ gauge_stations created successfully!")
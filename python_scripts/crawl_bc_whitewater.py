@@ -5,24 +5,83 @@ Extracts information about whitewater kayaking runs in British Columbia.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import json
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from urllib.parse import urljoin
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Use the libxml2 parser when installed; fall back to the pure-Python one
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
 BASE_URL = "https://www.bcwhitewater.org"
 REACHES_URL = f"{BASE_URL}/reaches"
 
+# Class/grade rating in listing text (e.g., "Class IV", "Grade III+")
+CLASS_PATTERN = re.compile(r'(?:Class|Grade)\s+([IV]+[+-]?|\d[+-]?)')
+
+def _class_selector(tags, keywords):
+    """Build a CSS selector for tags whose class contains any keyword (case-insensitive)."""
+    return ', '.join(f'{tag}[class*="{keyword}" i]' for tag in tags for keyword in keywords)
+
+# CSS selectors replacing per-node class_ callbacks
+RUN_SELECTOR = _class_selector(['tr', 'li', 'div'], ['reach', 'run'])
+RUN_LINK_SELECTOR = 'a[href*="/reach/"]'
+METADATA_SELECTOR = _class_selector(
+    ['dt', 'dd', 'span', 'div'],
+    ['difficulty', 'class', 'length', 'gradient', 'flow', 'putin', 'takeout'],
+)
+DESCRIPTION_SELECTOR = _class_selector(['div', 'p'], ['description'])
+
+# Run pages fetched at once, and the overall request rate kept polite to the site
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 4
+
+# Shared keep-alive session for all page fetches; retries transient server errors
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504]),
+))
+SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+})
+
+_rate_lock = threading.Lock()
+_next_request_at = 0.0
+
+def wait_for_rate_limit():
+    """Block until the next request slot, spacing requests across all threads."""
+    global _next_request_at
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + 1 / REQUESTS_PER_SECOND
+    if wait > 0:
+        time.sleep(wait)
+
 def fetch_page(url: str) -> Optional[BeautifulSoup]:
     """Fetch and parse a webpage."""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        wait_for_rate_limit()
+        response = SESSION.get(url, timeout=10)
         response.raise_for_status()
-        return BeautifulSoup(response.content, 'html.parser')
+        return BeautifulSoup(response.content, HTML_PARSER)
     except requests.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
@@ -35,11 +94,11 @@ def extract_river_runs(soup: BeautifulSoup) -> List[Dict]:
     # This will need to be adjusted based on actual page structure
     
     # Try to find table rows or list items with run information
-    run_elements = soup.find_all(['tr', 'li', 'div'], class_=lambda x: x and ('reach' in x.lower() or 'run' in x.lower()))
+    run_elements = soup.select(RUN_SELECTOR)
     
     if not run_elements:
         # Try alternative: find all links that might be runs
-        run_elements = soup.find_all('a', href=lambda x: x and '/reach/' in x)
+        run_elements = soup.select(RUN_LINK_SELECTOR)
     
     for element in run_elements:
         run_data = {}
@@ -54,8 +113,7 @@ def extract_river_runs(soup: BeautifulSoup) -> List[Dict]:
         text = element.get_text()
         if 'Class' in text or 'Grade' in text:
             # Look for class rating (e.g., "Class IV", "Grade III+")
-            import re
-            class_match = re.search(r'(?:Class|Grade)\s+([IV]+[+-]?|\d[+-]?)', text)
+            class_match = CLASS_PATTERN.search(text)
             if class_match:
                 run_data['difficulty'] = class_match.group(1)
         
@@ -81,33 +139,34 @@ def crawl_individual_run(url: str) -> Dict:
     
     # Look for common metadata fields
     # Difficulty, length, gradient, flow info, etc.
-    metadata = soup.find_all(['dt', 'dd', 'span', 'div'], class_=lambda x: x and any(
-        keyword in x.lower() for keyword in ['difficulty', 'class', 'length', 'gradient', 'flow', 'putin', 'takeout']
-    ))
+    metadata = soup.select(METADATA_SELECTOR)
     
     for element in metadata:
         text = element.get_text(strip=True)
         if text:
             # Try to categorize the data
-            if 'class' in text.lower() or 'difficulty' in text.lower():
+            lowered = text.lower()
+            if 'class' in lowered or 'difficulty' in lowered:
                 run_details['difficulty'] = text
-            elif 'length' in text.lower():
+            elif 'length' in lowered:
                 run_details['length'] = text
-            elif 'gradient' in text.lower():
+            elif 'gradient' in lowered:
                 run_details['gradient'] = text
-            elif 'flow' in text.lower():
+            elif 'flow' in lowered:
                 run_details['flow_info'] = text
     
     # Extract description
-    description = soup.find(['div', 'p'], class_=lambda x: x and 'description' in x.lower())
+    description = soup.select_one(DESCRIPTION_SELECTOR)
     if description:
         run_details['description'] = description.get_text(strip=True)
     
-    # Be polite - delay between requests
-    time.sleep(1)
-    
     return run_details
 
+def crawl_runs(urls: List[str]) -> List[Dict]:
+    """Crawl run pages concurrently, returning details in the same order as urls."""
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        return list(executor.map(crawl_individual_run, urls))
+
 def main():
     """Main crawling function."""
     print(f"Crawling BC Whitewater: {REACHES_URL}")
@@ -128,21 +187,19 @@ def main():
     # Optionally crawl individual run pages
     # Uncomment to enable detailed crawling (takes longer)
     """
-    detailed_runs = []
     print("\n2. Crawling individual run pages...")
-    for i, run in enumerate(runs[:5], 1):  # Limit to first 5 for testing
-        if 'url' in run:
-            print(f"[{i}/{len(runs[:5])}] {run.get('name', 'Unknown')}")
-            details = crawl_individual_run(run['url'])
-            detailed_runs.append(details)
-    
-    runs = detailed_runs
+    urls = [run['url'] for run in runs[:5] if 'url' in run]  # Limit to first 5 for testing
+    runs = crawl_runs(urls)
     """
     
     # Save results
     output_file = 'run_data/bc_whitewater_runs.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(runs, f, indent=2, ensure_ascii=False)
+    if orjson:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(runs, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(runs, f, indent=2, ensure_ascii=False)
     
     print(f"\n✅ Saved {len(runs)} runs to {output_file}")
     print("\nSample data:")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Seed the local Firestore emulator with a few river_runs for the finder scripts.
+
+Only runs against the emulator, never production.
+
+Usage:
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 seed_emulator.py
+"""
+
+import os
+import sys
+
+try:
+    import firebase_admin
+    from firebase_admin import firestore
+except ImportError:
+    print("❌ Error: firebase-admin not installed")
+    print("Install with: pip install firebase-admin")
+    sys.exit(1)
+
+from add_name_tokens import name_tokens
+
+# Project ID the emulator data is stored under (matches firebase.json)
+PROJECT_ID = 'brownclaw'
+
+# Fixture runs covering both default favorites plus a non-matching run
+RIVER_RUNS = {
+    'kananaskis-river-widowmaker-to-canoe-meadows': {
+        'name': 'Widowmaker to Canoe Meadows',
+        'river': 'Kananaskis River',
+        'location': 'Kananaskis Country, AB',
+        'difficulty': 'Class II-III',
+        'hasValidStation': True,
+        'stationId': '05BF005',
+    },
+    'bow-river-harvie-passage': {
+        'name': 'Harvie Passage',
+        'river': 'Bow River',
+        'location': 'Calgary, AB',
+        'difficulty': 'Class II',
+        'hasValidStation': True,
+        'stationId': '05BH004',
+    },
+    'chilliwack-river-upper': {
+        'name': 'Upper Chilliwack',
+        'river': 'Chilliwack River',
+        'location': 'Chilliwack, BC',
+        'difficulty': 'Class III-IV',
+        'hasValidStation': True,
+        'stationId': '08MH001',
+    },
+}
+
+def main():
+    emulator_host = os.environ.get('FIRESTORE_EMULATOR_HOST')
+    if not emulator_host:
+        print("❌ FIRESTORE_EMULATOR_HOST is not set; refusing to write to production")
+        sys.exit(1)
+
+    print(f"🧪 Seeding Firestore emulator at {emulator_host}...")
+    firebase_admin.initialize_app(options={'projectId': PROJECT_ID})
+    db = firestore.client()
+
+    batch = db.batch()
+    for run_id, run in RIVER_RUNS.items():
+        batch.set(db.collection('river_runs').document(run_id), {**run, 'name_tokens': name_tokens(run)})
+    batch.commit()
+
+    print(f"✅ Seeded {len(RIVER_RUNS)} river_runs")
+
+if __name__ == '__main__':
+    main()
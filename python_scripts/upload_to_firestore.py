@@ -33,6 +33,8 @@ except ImportError:
     print("Install with: pip install firebase-admin")
     sys.exit(1)
 
+from add_name_tokens import name_tokens
+
 # Paths
 INPUT_DIR = 'run_data/firestore_import'
 RIVERS_FILE = os.path.join(INPUT_DIR, 'rivers.json')
@@ -120,6 +122,9 @@ def upload_collection(db, collection_name: str, data: List[Dict], dry_run: bool
         item_data = convert_timestamps(item)
         # Remove 'id' field (it's the document ID)
         item_data.pop('id', None)
+        # Searchable words for the finder scripts' array_contains queries
+        if collection_name == 'river_runs':
+            item_data['name_tokens'] = name_tokens(item_data)
         
         batch.set(doc_ref, item_data)
         batch_count += 1